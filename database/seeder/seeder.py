@@ -1,9 +1,12 @@
+import io
 import os
-import json
 import logging
 import argparse
+import orjson
+import numpy as np
+from operator import itemgetter
+from multiprocessing import Pool, cpu_count
 import psycopg2
-from psycopg2.extras import execute_values
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -30,17 +33,182 @@ if not all(DB_CONFIG.values()):
 
 BASE_DATA_DIR = Path("data/flights")
 
+POSITIONS_COPY_SQL = """
+    COPY flight_positions (
+        flight_id, "timestamp", latitude, longitude, altitude, ground_speed, vertical_rate
+    ) FROM STDIN WITH (FORMAT TEXT)
+"""
+
+FLIGHTS_UPSERT_PARAM_TYPES = (
+    ("text[]",) * 7
+    + ("timestamptz[]",) * 2
+    + ("integer[]", "numeric[]", "numeric[]")
+    + ("integer[]",) * 5
+    + ("numeric[]",) * 12
+)
+FLIGHTS_UPSERT_PREPARE_SQL = f"""
+    PREPARE flights_upsert ({", ".join(FLIGHTS_UPSERT_PARAM_TYPES)}) AS
+    INSERT INTO flights (
+        fr24_id, flight, callsign, aircraft_model, aircraft_reg,
+        departure_icao, arrival_icao, departure_time_utc, arrival_time_utc,
+        flight_duration_s, distance_calculated_km, great_circle_distance_km,
+        duration_takeoff_s, duration_climb_s, duration_cruise_s, duration_descent_s, duration_landing_s,
+        fuel_takeoff_kg, fuel_climb_kg, fuel_cruise_kg, fuel_descent_kg, fuel_landing_kg,
+        co2_takeoff_kg, co2_climb_kg, co2_cruise_kg, co2_descent_kg, co2_landing_kg,
+        co2_total_kg, co2_per_passenger_kg
+    )
+    SELECT * FROM UNNEST(
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15,
+        $16, $17, $18, $19, $20, $21, $22, $23, $24, $25, $26, $27, $28, $29
+    )
+    ON CONFLICT (fr24_id) DO UPDATE SET
+        flight = EXCLUDED.flight, callsign = EXCLUDED.callsign,
+        distance_calculated_km = EXCLUDED.distance_calculated_km,
+        co2_total_kg = EXCLUDED.co2_total_kg, last_updated = NOW()
+    RETURNING flight_id, fr24_id;
+"""
+FLIGHTS_UPSERT_EXECUTE_SQL = "EXECUTE flights_upsert ({});".format(
+    ", ".join(f"%s::{param_type}" for param_type in FLIGHTS_UPSERT_PARAM_TYPES)
+)
+
+POSITION_FIELDS = ("latitude", "longitude", "altitude", "ground_speed", "vertical_rate")
+# assemble_flights.py always writes every key, so a single C-level itemgetter
+# call can replace the per-field .get() lookups.
+_POSITION_KEYS = itemgetter("timestamp", *POSITION_FIELDS)
+
+
+def _copy_column(values):
+    """Render a numeric column in COPY TEXT format (no escaping needed)."""
+    return ["\\N" if v is None else str(v) for v in values]
+
+
+def build_positions_copy_buffer(flight_positions):
+    """Serialize (flight_id, positions) pairs into one in-memory COPY TEXT stream.
+
+    Positions are transposed into per-field columns first so each column is
+    formatted in a single pass instead of building a tuple per row.
+    """
+    buf = io.StringIO()
+    for flight_id, positions in flight_positions:
+        timestamps, *value_cols = zip(*map(_POSITION_KEYS, positions))
+        flight_col = [str(flight_id)] * len(positions)
+        ts_col = np.datetime_as_string(
+            np.array(timestamps, dtype=np.int64).astype("datetime64[s]"),
+            unit="s",
+            timezone="UTC",
+        ).tolist()
+        buf.writelines(
+            "\t".join(row) + "\n"
+            for row in zip(flight_col, ts_col, *map(_copy_column, value_cols))
+        )
+    buf.seek(0)
+    return buf
+
+
+FLIGHT_FIELDS = (
+    "fr24_id",
+    "flight",
+    "callsign",
+    "aircraft_model",
+    "aircraft_reg",
+    "departure_icao",
+    "arrival_icao",
+    "departure_time_utc",
+    "arrival_time_utc",
+    "flight_duration_s",
+    "distance_calculated_km",
+    "great_circle_distance_km",
+)
+TOTAL_FIELDS = ("co2_total_kg", "co2_per_passenger_kg")
+PHASES = ("takeoff", "climb", "cruise", "descent", "landing")
+
+_FLIGHT_KEYS = itemgetter(*FLIGHT_FIELDS)
+_TOTAL_KEYS = itemgetter(*TOTAL_FIELDS)
+_PHASE_KEYS = itemgetter(*PHASES)
+# Every top-level field except fr24_id is optional in the processed files.
+_FLIGHT_DEFAULTS = dict.fromkeys(FLIGHT_FIELDS[1:] + TOTAL_FIELDS)
+
+
+def build_flight_tuple(f):
+    f = {**_FLIGHT_DEFAULTS, **f}
+    return (
+        *_FLIGHT_KEYS(f),
+        *_PHASE_KEYS(f["phase_durations_s"]),
+        *_PHASE_KEYS(f["fuel_estimated_kg"]),
+        *_PHASE_KEYS(f["co2_estimated_kg"]),
+        *_TOTAL_KEYS(f),
+    )
+
 
 def get_all_processed_files(base_directory: Path):
     if not base_directory.is_dir():
         logging.error(f"Base data directory not found: {base_directory}")
         return []
-    search_pattern = "run_*/processed/flights_processed_*.json"
-    files = list(base_directory.glob(search_pattern))
+    files = []
+    with os.scandir(base_directory) as run_entries:
+        for run_entry in run_entries:
+            if not (run_entry.name.startswith("run_") and run_entry.is_dir()):
+                continue
+            processed_dir = os.path.join(run_entry.path, "processed")
+            try:
+                with os.scandir(processed_dir) as file_entries:
+                    files.extend(
+                        Path(entry.path)
+                        for entry in file_entries
+                        if entry.name.startswith("flights_processed_")
+                        and entry.name.endswith(".json")
+                    )
+            except FileNotFoundError:
+                continue
     logging.info(f"Found {len(files)} processed JSON files.")
     return files
 
 
+def load_seed_payload(json_file):
+    """Read a processed file and its run's details map (runs in a worker).
+
+    Returns the upsert tuples plus the positions of the flights listed in
+    the file, so the main process never touches the JSON files itself.
+    """
+    run_dir = json_file.parents[1]
+    details_map_file = next(run_dir.glob("flight_details_map_*.json"), None)
+    if not details_map_file:
+        logging.error(f"Could not find flight_details_map.json in {run_dir}. Skipping.")
+        return json_file, None, None
+
+    try:
+        with open(json_file, "rb") as f:
+            flights_data = orjson.loads(f.read())
+        flight_tuples = [build_flight_tuple(f) for f in flights_data]
+        with open(details_map_file, "rb") as f:
+            details_map = orjson.loads(f.read())
+    except Exception as error:
+        logging.error(f"❌ Could not parse {json_file}: {error}")
+        return json_file, None, None
+
+    positions_by_id = {}
+    for flight_tuple in flight_tuples:
+        fr24_id = flight_tuple[0]
+        positions = (details_map.get(fr24_id) or {}).get("positions")
+        if positions:
+            positions_by_id[fr24_id] = positions
+
+    logging.info(f"📄 Loaded {len(flight_tuples)} flights from {json_file.name}")
+    return json_file, flight_tuples, positions_by_id
+
+
+def iter_seed_payloads(pool, json_files, window):
+    """Yield load_seed_payload results in file order, at most `window` ahead.
+
+    The same fr24_id appears in several runs, so files are upserted in a
+    fixed (sorted) order to make the surviving row deterministic. Files are
+    handed to the pool one window at a time, which bounds how many parsed
+    payloads can sit in memory waiting for the database.
+    """
+    for start in range(0, len(json_files), window):
+        yield from pool.imap(load_seed_payload, json_files[start : start + window])
+
+
 def seed_database(json_files_to_process):
     try:
         logging.info("Connecting to the PostgreSQL database...")
@@ -50,129 +218,95 @@ def seed_database(json_files_to_process):
         logging.critical(f"❌ Could not connect to database: {e}")
         return
 
-    for json_file in json_files_to_process:
-        logging.info(f"--- Processing file: {json_file} ---")
-        run_dir = json_file.parents[1]
-
-        details_map_file = next(run_dir.glob("flight_details_map_*.json"), None)
-        if not details_map_file:
-            logging.error(
-                f"Could not find flight_details_map.json in {run_dir}. Skipping."
-            )
-            continue
-
-        with open(details_map_file, "r", encoding="utf-8") as f:
-            details_map = json.load(f)
-
-        try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                flights_data = json.load(f)
-            logging.info(f"📄 Loaded {len(flights_data)} flights from {json_file.name}")
-
-            with conn.cursor() as cur:
-                flight_tuples = [
-                    (
-                        f["fr24_id"],
-                        f.get("flight"),
-                        f.get("callsign"),
-                        f.get("aircraft_model"),
-                        f.get("aircraft_reg"),
-                        f.get("departure_icao"),
-                        f.get("arrival_icao"),
-                        f.get("departure_time_utc"),
-                        f.get("arrival_time_utc"),
-                        f.get("flight_duration_s"),
-                        f.get("distance_calculated_km"),
-                        f.get("great_circle_distance_km"),
-                        f["phase_durations_s"]["takeoff"],
-                        f["phase_durations_s"]["climb"],
-                        f["phase_durations_s"]["cruise"],
-                        f["phase_durations_s"]["descent"],
-                        f["phase_durations_s"]["landing"],
-                        f["fuel_estimated_kg"]["takeoff"],
-                        f["fuel_estimated_kg"]["climb"],
-                        f["fuel_estimated_kg"]["cruise"],
-                        f["fuel_estimated_kg"]["descent"],
-                        f["fuel_estimated_kg"]["landing"],
-                        f["co2_estimated_kg"]["takeoff"],
-                        f["co2_estimated_kg"]["climb"],
-                        f["co2_estimated_kg"]["cruise"],
-                        f["co2_estimated_kg"]["descent"],
-                        f["co2_estimated_kg"]["landing"],
-                        f.get("co2_total_kg"),
-                        f.get("co2_per_passenger_kg"),
-                    )
-                    for f in flights_data
-                ]
-
-                inserted_flights = execute_values(
-                    cur,
-                    """
-                    INSERT INTO flights (
-                        fr24_id, flight, callsign, aircraft_model, aircraft_reg,
-                        departure_icao, arrival_icao, departure_time_utc, arrival_time_utc,
-                        flight_duration_s, distance_calculated_km, great_circle_distance_km,
-                        duration_takeoff_s, duration_climb_s, duration_cruise_s, duration_descent_s, duration_landing_s,
-                        fuel_takeoff_kg, fuel_climb_kg, fuel_cruise_kg, fuel_descent_kg, fuel_landing_kg,
-                        co2_takeoff_kg, co2_climb_kg, co2_cruise_kg, co2_descent_kg, co2_landing_kg,
-                        co2_total_kg, co2_per_passenger_kg
-                    ) VALUES %s
-                    ON CONFLICT (fr24_id) DO UPDATE SET
-                        flight = EXCLUDED.flight, callsign = EXCLUDED.callsign,
-                        distance_calculated_km = EXCLUDED.distance_calculated_km,
-                        co2_total_kg = EXCLUDED.co2_total_kg, last_updated = NOW()
-                    RETURNING flight_id, fr24_id;
-                    """,
-                    flight_tuples,
-                    fetch=True,
-                )
+    # The seed data is reproducible from the JSON files, so trading commit
+    # durability for speed is acceptable for this session.
+    with conn.cursor() as cur:
+        cur.execute("SET synchronous_commit = OFF;")
+        cur.execute(FLIGHTS_UPSERT_PREPARE_SQL)
+        # Rebuilding the timestamp index once after the load is cheaper than
+        # updating it row by row. The flight_id index is kept because the
+        # per-file DELETE ... ANY() relies on it. The drop is committed on its
+        # own so its ACCESS EXCLUSIVE lock is not held for the whole seed.
+        cur.execute("DROP INDEX IF EXISTS idx_flight_positions_timestamp;")
+    conn.commit()
 
-                flight_id_map = {fr24_id: db_id for db_id, fr24_id in inserted_flights}
-                logging.info(
-                    f"✅ Bulk upsert complete. {len(flight_id_map)} flights processed."
-                )
+    workers = max(1, min(cpu_count(), len(json_files_to_process)))
+    with Pool(workers) as pool:
+        for json_file, flight_tuples, positions_by_id in iter_seed_payloads(
+            pool, sorted(json_files_to_process), workers
+        ):
+            if flight_tuples is None:
+                continue
 
-                for fr24_id, flight_id in flight_id_map.items():
-                    flight_detail_data = details_map.get(fr24_id)
-                    if not flight_detail_data:
-                        continue
+            logging.info(f"--- Processing file: {json_file} ---")
+            if not flight_tuples:
+                # Nothing to upsert; the prepared statement needs one column
+                # per placeholder, which zip(*[]) cannot provide.
+                logging.info("No flights in file. Skipping.")
+                continue
 
-                    positions = flight_detail_data.get("positions", [])
-                    if not positions:
-                        continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SAVEPOINT seed_file;")
+                    flight_columns = [list(col) for col in zip(*flight_tuples)]
+                    cur.execute(FLIGHTS_UPSERT_EXECUTE_SQL, flight_columns)
+                    inserted_flights = cur.fetchall()
 
-                    cur.execute(
-                        "DELETE FROM flight_positions WHERE flight_id = %s;",
-                        (flight_id,),
+                    flight_id_map = {
+                        fr24_id: db_id for db_id, fr24_id in inserted_flights
+                    }
+                    logging.info(
+                        f"✅ Bulk upsert complete. {len(flight_id_map)} flights processed."
                     )
-                    position_data = [
-                        (
-                            flight_id,
-                            psycopg2.TimestampFromTicks(pos["timestamp"]),
-                            pos.get("latitude"),
-                            pos.get("longitude"),
-                            pos.get("altitude"),
-                            pos.get("ground_speed"),
-                            pos.get("vertical_rate"),
+
+                    flight_positions = []
+                    for fr24_id, flight_id in flight_id_map.items():
+                        positions = positions_by_id.get(fr24_id)
+                        if positions:
+                            flight_positions.append((flight_id, positions))
+
+                    if flight_positions:
+                        cur.execute(
+                            "DELETE FROM flight_positions WHERE flight_id = ANY(%s);",
+                            ([flight_id for flight_id, _ in flight_positions],),
+                        )
+                        cur.copy_expert(
+                            POSITIONS_COPY_SQL,
+                            build_positions_copy_buffer(flight_positions),
+                        )
+                        logging.info(
+                            f"✅ Positions loaded for {len(flight_positions)} flights."
                         )
-                        for pos in positions
-                    ]
-                    execute_values(
-                        cur,
-                        'INSERT INTO flight_positions (flight_id, "timestamp", latitude, longitude, altitude, ground_speed, vertical_rate) VALUES %s;',
-                        position_data,
-                        page_size=500,
-                    )
 
-            conn.commit()
-            logging.info("✅ File processed and committed.")
+                    cur.execute("RELEASE SAVEPOINT seed_file;")
+                logging.info("✅ File processed.")
 
-        except (Exception, psycopg2.Error) as error:
-            logging.error(
-                f"❌ A critical error occurred while processing {json_file}: {error}"
+            except (Exception, psycopg2.Error) as error:
+                logging.error(
+                    f"❌ A critical error occurred while processing {json_file}: {error}"
+                )
+                with conn.cursor() as cur:
+                    cur.execute("ROLLBACK TO SAVEPOINT seed_file;")
+
+    try:
+        conn.commit()
+        logging.info("✅ All files committed in a single transaction.")
+    except psycopg2.Error as error:
+        logging.error(f"❌ Final commit failed: {error}")
+        conn.rollback()
+
+    # Recreated in its own short transaction, whether or not the load
+    # committed, so the table is never left without the index.
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_flight_positions_timestamp "
+                'ON flight_positions("timestamp");'
             )
-            if conn:
-                conn.rollback()
+        conn.commit()
+    except psycopg2.Error as error:
+        logging.error(f"❌ Could not recreate idx_flight_positions_timestamp: {error}")
+        conn.rollback()
 
     if conn:
         conn.close()
@@ -1,14 +1,31 @@
 import os
+import re
+import gzip
+import calendar
 import time
-import json
+import random
+import orjson
 import requests
 import logging
+import threading
+from array import array
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from dotenv import load_dotenv
-from geopy.distance import geodesic
+import numpy as np
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
+
+try:
+    from numba import njit
+except ImportError:  # numba es opcional: sin él se usan los kernels NumPy
+    njit = None
 
 # --- Logging config ---
 log_dir = Path("logs")
@@ -22,6 +39,8 @@ logging.basicConfig(
         logging.StreamHandler(),
     ],
 )
+# Con DEBUG en la raíz, numba volcaría miles de líneas al compilar los kernels.
+logging.getLogger("numba").setLevel(logging.WARNING)
 
 # --- Load environment and config ---
 load_dotenv()
@@ -38,109 +57,440 @@ HEADERS = {
     "Authorization": f"Bearer {API_KEY}",
 }
 
+# Una sesión por hilo: requests.Session no garantiza ser thread-safe, y cada
+# hilo de los pools reutiliza así su propia conexión keep-alive.
+_thread_local = threading.local()
+
+
+def get_session():
+    """Devuelve la sesión HTTP del hilo actual, creándola si no existe."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        _thread_local.session = session
+    return session
+
+
 SUMMARY_URL = "https://fr24api.flightradar24.com/api/flight-summary/full"
 POSITIONS_URL = "https://fr24api.flightradar24.com/api/historic/flight-positions/full"
 
+# Segundos de espera por respuesta; sin límite una conexión colgada bloquea el hilo.
+REQUEST_TIMEOUT = 30
+
 # Define bounds for the contiguous United States
 USA_BOUNDS = "49.38,24.52,-124.77,-66.95"  # North, South, West, East
 
 try:
-    with open("data/fuel_profiles.json", "r") as f:
-        FUEL_PROFILES = json.load(f)
+    with open("data/fuel_profiles.json", "rb") as f:
+        FUEL_PROFILES = orjson.loads(f.read())
 except FileNotFoundError:
     logging.critical(
         "No se encontró 'data/fuel_profiles.json'. Asegúrate de que el archivo existe."
     )
     raise
-except json.JSONDecodeError:
+except orjson.JSONDecodeError:
     logging.critical(
         "Error al decodificar 'data/fuel_profiles.json'. Asegúrate de que es un JSON válido."
     )
     raise
 
+PHASES = ("takeoff", "climb", "cruise", "descent", "landing")
+CO2_PER_KG_FUEL = 3.16
+
+# Tasas de combustible (kg/h por fase) y asientos precalculados por modelo.
+FUEL_RATES = {
+    model: np.array([profile.get(ph, 0) for ph in PHASES], dtype=np.float64)
+    for model, profile in FUEL_PROFILES.items()
+}
+SEATS = {model: profile.get("seats") or 150 for model, profile in FUEL_PROFILES.items()}
+
+
+def model_key(model):
+    """Normaliza un código de modelo de FR24: mayúsculas y sin signos ('b-738' -> 'B738')."""
+    return re.sub(r"[^A-Z0-9]", "", model.upper())
+
+
+PROFILE_KEYS = {model_key(model): model for model in FUEL_PROFILES}
+
+
+@lru_cache(maxsize=1024)
+def resolve_model(model):
+    """Clave de FUEL_PROFILES para un modelo de FR24, o 'default' si no existe."""
+    return PROFILE_KEYS.get(model_key(model or ""), "default")
+
+
 DAYS = 1
 INTERVAL_MINUTES = 10
 MINIMUM_DATA_POINTS = 5
+SNAPSHOT_WORKERS = 8
+# El endpoint de resúmenes acepta como máximo 15 vuelos por consulta.
+SUMMARY_BATCH_SIZE = 15
+SUMMARY_WORKERS = 10
+EARTH_RADIUS_KM = 6371.0088
+# Solo para depurar: escribe los JSON con sangría (más lentos y más grandes).
+PRETTY_JSON = False
+# Cuota de la API de FR24 (peticiones/minuto) por endpoint, compartida por los
+# hilos de ese endpoint; se ajusta al plan con variables de entorno (.env).
+# 0 = sin ritmo fijo: solo se frena tras un 429 (Retry-After).
+SNAPSHOT_REQUESTS_PER_MINUTE = float(
+    os.getenv("FR24_SNAPSHOT_REQUESTS_PER_MINUTE", "60")
+)  # ~1 petición/s, como el bucle secuencial original
+SUMMARY_REQUESTS_PER_MINUTE = float(os.getenv("FR24_SUMMARY_REQUESTS_PER_MINUTE", "0"))
+API_BURST = 3
+
+
+def backoff_delay(attempt, base, cap=60):
+    """
+    Espera exponencial con jitter (±50%) para el intento dado. Con varios
+    hilos reintentando a la vez, el jitter evita que vuelvan todos juntos.
+    """
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
 
 
-def calculate_distance(coords):
-    """Calcula la distancia total recorrida a partir de una lista de coordenadas."""
-    if not coords or len(coords) < 2:
-        return 0
+def wait_for_retry(response, fallback):
+    """Segundos a esperar tras un 429: Retry-After si el servidor lo envía."""
     try:
-        distance = round(
-            sum(geodesic(coords[i], coords[i + 1]).km for i in range(len(coords) - 1)),
-            2,
-        )
-        logging.debug(f"Distancia calculada: {distance} km")
-        return distance
-    except Exception as e:
-        logging.error(f"Error al calcular la distancia: {e}")
-        return 0
-
-
-def detect_phases(points, vr_thr=3, low_alt=500):
-    """Detecta las fases de vuelo (despegue, ascenso, crucero, descenso, aterrizaje) y calcula sus duraciones."""
-    durations = {"takeoff": 0, "climb": 0, "cruise": 0, "descent": 0, "landing": 0}
-    if not points:
-        logging.warning("No hay puntos para detectar fases de vuelo.")
-        return durations
-
-    for i in range(len(points) - 1):
-        p0, p1 = points[i], points[i + 1]
-        dt = p1["timestamp"] - p0["timestamp"]
-        vr = p0.get("vertical_rate", 0)
-        alt = p0.get("altitude", 0)
-        spd = p0.get("ground_speed", 0)
-
-        if spd > 30 and alt < low_alt and vr > 1:
-            ph = "takeoff"
-        elif vr > vr_thr:
-            ph = "climb"
-        elif vr < -vr_thr:
-            ph = "descent"
-        elif alt < low_alt and spd < 50 and vr < 1:
-            ph = "landing"
-        else:
-            ph = "cruise"
-        durations[ph] += dt
-    logging.debug(f"Fases de vuelo detectadas: {durations}")
-    return durations
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return fallback
 
 
-def estimate_fuel(durations, model="default"):
-    """Estima el consumo de combustible por fase de vuelo."""
-    fuel_rates = FUEL_PROFILES.get(model, FUEL_PROFILES.get("default"))
-    if not fuel_rates:
-        logging.warning(
-            f"No se encontraron perfiles de combustible para el modelo '{model}'. Usando 'default'."
-        )
-        fuel_rates = FUEL_PROFILES.get("default")
-        if not fuel_rates:
-            logging.error("No se encontró el perfil de combustible 'default'.")
-            return {ph: 0 for ph in durations}
+class TokenBucket:
+    """
+    Limitador de tasa (token bucket) compartido entre hilos. acquire()
+    bloquea hasta que hay un token; pause() detiene a todos los hilos, p. ej.
+    durante el Retry-After de un 429. Con rate_per_second = 0 no limita el
+    ritmo y solo respeta las pausas.
+    """
 
-    estimated_fuel = {
-        ph: round((durations[ph] / 3600) * fuel_rates.get(ph, 0), 2) for ph in durations
-    }
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    if not self.rate:
+                        return
+                    self.tokens = min(
+                        self.capacity, self.tokens + (now - self.updated) * self.rate
+                    )
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    delay = (1 - self.tokens) / self.rate
+                else:
+                    delay = self.paused_until - now
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+
+SNAPSHOT_LIMITER = TokenBucket(SNAPSHOT_REQUESTS_PER_MINUTE / 60, API_BURST)
+SUMMARY_LIMITER = TokenBucket(SUMMARY_REQUESTS_PER_MINUTE / 60, API_BURST)
+
+
+def write_json(path, obj):
+    """Serializa obj con orjson (acepta arrays NumPy); compacto salvo PRETTY_JSON."""
+    option = orjson.OPT_SERIALIZE_NUMPY
+    if PRETTY_JSON:
+        option |= orjson.OPT_INDENT_2
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(obj, option=option))
+
+
+def write_snapshot_line(raw_file, ts, positions):
+    """Añade una instantánea como una línea NDJSON al archivo raw del día."""
+    raw_file.write(orjson.dumps({"timestamp": ts, "positions": positions}) + b"\n")
+
+
+def flight_totals(ts, lat, lon, vr, alt, spd, vr_thr, low_alt):
+    """
+    Distancia haversine total (km) y segundos por fase (en el orden de PHASES)
+    en una sola pasada sobre los segmentos del vuelo. lat/lon en radianes;
+    cada segmento se clasifica según su punto inicial.
+    """
+    dt = np.diff(ts)
+    lat0, lat1 = lat[:-1], lat[1:]
+    a = (
+        np.sin((lat1 - lat0) / 2) ** 2
+        + np.cos(lat0) * np.cos(lat1) * np.sin(np.diff(lon) / 2) ** 2
+    )
+    distance = float((2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).sum())
+
+    vr, alt, spd = vr[:-1], alt[:-1], spd[:-1]
+    # Las etiquetas se escriben de menor a mayor prioridad (la última gana):
+    # takeoff > climb > descent > landing > cruise.
+    low = alt < low_alt
+    labels = np.full(len(dt), PHASES.index("cruise"), dtype=np.int8)
+    labels[low & (spd < 50) & (vr < 1)] = PHASES.index("landing")
+    labels[vr < -vr_thr] = PHASES.index("descent")
+    labels[vr > vr_thr] = PHASES.index("climb")
+    labels[(spd > 30) & low & (vr > 1)] = PHASES.index("takeoff")
+    return distance, np.bincount(labels, weights=dt, minlength=len(PHASES))
+
+
+if njit is not None:
+    # Con numba, el mismo kernel se compila como un bucle simple, que evita
+    # los arrays temporales de la versión NumPy.
+
+    @njit(cache=True)
+    def flight_totals(ts, lat, lon, vr, alt, spd, vr_thr, low_alt):
+        distance = 0.0
+        # Índices según PHASES: takeoff, climb, cruise, descent, landing.
+        totals = np.zeros(5)
+        for i in range(ts.shape[0] - 1):
+            a = (
+                np.sin((lat[i + 1] - lat[i]) / 2) ** 2
+                + np.cos(lat[i])
+                * np.cos(lat[i + 1])
+                * np.sin((lon[i + 1] - lon[i]) / 2) ** 2
+            )
+            distance += 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+            if spd[i] > 30 and alt[i] < low_alt and vr[i] > 1:
+                ph = 0
+            elif vr[i] > vr_thr:
+                ph = 1
+            elif vr[i] < -vr_thr:
+                ph = 3
+            elif alt[i] < low_alt and spd[i] < 50 and vr[i] < 1:
+                ph = 4
+            else:
+                ph = 2
+            totals[ph] += ts[i + 1] - ts[i]
+        return distance, totals
+
+
+def compute_flight_metrics(flight, vr_thr=3, low_alt=500):
+    """
+    Calcula la distancia recorrida (km) y la duración de cada fase de un vuelo
+    a partir de sus columnas de posiciones (lat/lon en grados).
+    """
+    distance, sums = flight_totals(
+        flight["timestamp"],
+        np.radians(flight["latitude"]),
+        np.radians(flight["longitude"]),
+        flight["vertical_rate"],
+        flight["altitude"],
+        flight["ground_speed"],
+        vr_thr,
+        low_alt,
+    )
+    distance = round(distance, 2)
+    logging.debug(f"Distancia calculada: {distance} km")
+    return distance, {ph: int(total) for ph, total in zip(PHASES, sums)}
+
+
+def estimate_fuel(durations, model="default"):
+    """Estima el consumo de combustible (kg) por fase, en el orden de PHASES."""
+    fuel_rates = FUEL_RATES.get(resolve_model(model))
+    if fuel_rates is None:
+        logging.error("No se encontró el perfil de combustible 'default'.")
+        return np.zeros(len(PHASES))
+
+    phase_seconds = np.array([durations[ph] for ph in PHASES], dtype=np.float64)
+    estimated_fuel = np.round(phase_seconds / 3600 * fuel_rates, 2)
     logging.debug(f"Combustible estimado: {estimated_fuel}")
     return estimated_fuel
 
 
-def estimate_co2_by_passenger(fuel_kg, model="default"):
-    """Estima las emisiones de CO2 por pasajero."""
-    co2_total = sum(fuel_kg[ph] * 3.16 for ph in fuel_kg)
-    seats = FUEL_PROFILES.get(model, FUEL_PROFILES["default"]).get("seats", 150)
-    if not seats:
-        logging.warning(
-            f"Número de asientos no definido para el modelo '{model}'. Usando 150 por defecto."
+# Las posiciones de cada vuelo se guardan por columnas (structure of arrays)
+# en lugar de un dict por punto; sólo se convierten a dicts al escribir JSON.
+POSITION_FIELDS = (
+    "timestamp",
+    "latitude",
+    "longitude",
+    "vertical_rate",
+    "altitude",
+    "ground_speed",
+)
+POSITION_TYPECODES = ("q", "d", "d", "d", "d", "d")
+
+
+def new_flight_columns():
+    flight = {
+        field: array(code) for field, code in zip(POSITION_FIELDS, POSITION_TYPECODES)
+    }
+    flight["callsign_or_flight"] = None
+    # Timestamps ya registrados: instantáneas solapadas repiten el mismo punto.
+    flight["seen"] = set()
+    return flight
+
+
+def sort_flight_columns(flight):
+    """
+    Convierte las columnas a arrays NumPy ordenados por timestamp. Las
+    instantáneas se ingieren en orden cronológico, así que casi siempre ya
+    vienen ordenadas: en ese caso se evita el argsort y la copia.
+    """
+    del flight["seen"]
+    ts = np.frombuffer(flight["timestamp"], dtype=np.int64)
+    if (ts[1:] >= ts[:-1]).all():
+        for field in POSITION_FIELDS:
+            flight[field] = np.asarray(flight[field])
+        return flight
+
+    order = np.argsort(ts, kind="stable")
+    for field in POSITION_FIELDS:
+        flight[field] = np.asarray(flight[field])[order]
+    return flight
+
+
+PATH_DTYPE = np.dtype(
+    [
+        (field, "i8" if code == "q" else "f8")
+        for field, code in zip(POSITION_FIELDS, POSITION_TYPECODES)
+    ]
+)
+
+
+def flight_path_array(flight):
+    """Empaqueta las columnas de un vuelo en un array estructurado (PATH_DTYPE)."""
+    path = np.empty(len(flight["timestamp"]), dtype=PATH_DTYPE)
+    for field in POSITION_FIELDS:
+        path[field] = flight[field]
+    return path
+
+
+def flight_points(flight):
+    """Reconstruye la lista de puntos (dicts) a partir de las columnas."""
+    columns = [flight[field].tolist() for field in POSITION_FIELDS]
+    return [dict(zip(POSITION_FIELDS, row)) for row in zip(*columns)]
+
+
+@lru_cache(maxsize=65536)
+def parse_fr24_timestamp(value):
+    """
+    Convierte un timestamp ISO-8601 de FR24 a segundos epoch. El formato fijo
+    'YYYY-MM-DDTHH:MM:SSZ' se trocea directamente; cualquier otro pasa por
+    datetime.fromisoformat. Los puntos de una instantánea comparten muy pocos
+    valores distintos, así que el resultado se memoiza.
+    """
+    if len(value) == 20 and value[10] == "T" and value[19] == "Z":
+        return calendar.timegm(
+            (
+                int(value[0:4]),
+                int(value[5:7]),
+                int(value[8:10]),
+                int(value[11:13]),
+                int(value[14:16]),
+                int(value[17:19]),
+            )
         )
-        seats = 150
-    co2_per_passenger = round(co2_total / seats, 2)
-    logging.debug(
-        f"CO2 total: {co2_total} kg, CO2 por pasajero: {co2_per_passenger} kg"
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+
+def fetch_snapshot(ts: int):
+    """
+    Descarga una instantánea de posiciones para un timestamp (con reintentos).
+    Devuelve la lista de vuelos, o None si fallan todos los intentos.
+    """
+    timestamp_utc_dt = datetime.fromtimestamp(ts, timezone.utc)
+    logging.info(
+        f"🛰 Solicitando instantánea en {timestamp_utc_dt.strftime('%Y-%m-%d %H:%M:%S UTC')} para EE.UU. ({USA_BOUNDS})"
     )
-    return co2_per_passenger
+
+    for attempt in range(1, 6):
+        try:
+            SNAPSHOT_LIMITER.acquire()
+            r = get_session().get(
+                POSITIONS_URL,
+                params={"bounds": USA_BOUNDS, "timestamp": ts},
+                timeout=REQUEST_TIMEOUT,
+            )
+            if r.status_code == 429:
+                wait_time = wait_for_retry(r, backoff_delay(attempt, 10))
+                logging.warning(
+                    f"⚠️ Demasiadas solicitudes (429) en el intento {attempt}. Esperando {wait_time:.1f}s..."
+                )
+                SNAPSHOT_LIMITER.pause(wait_time)
+                continue
+            if r.status_code == 400:
+                logging.error(
+                    f"❌ Error 400 Bad Request en el timestamp {ts} (Intento {attempt}/5): {r.text}. Posiblemente data no disponible para este timestamp o fuera del rango de la clave API."
+                )
+                time.sleep(5)
+                continue
+            r.raise_for_status()
+
+            data = orjson.loads(r.content)
+
+            return data.get("positions") or data.get("data") or []
+        except requests.exceptions.RequestException as e:
+            logging.error(
+                f"Error de red o HTTP al obtener vuelos en el timestamp {ts} (Intento {attempt}/5): {e}"
+            )
+            time.sleep(backoff_delay(attempt, 5))
+        except Exception as e:
+            logging.error(
+                f"Error inesperado al obtener vuelos en el timestamp {ts} (Intento {attempt}/5): {e}"
+            )
+            time.sleep(backoff_delay(attempt, 5))
+
+    logging.error(f"❌ Fallaron todos los intentos para el timestamp {ts}.")
+    return None
+
+
+def iter_snapshot_points(flights_in_snapshot):
+    """
+    Recorre una instantánea y genera (fr24_id, callsign, punto) por vuelo,
+    donde punto sigue el orden de POSITION_FIELDS o es None si le faltan
+    coordenadas o un timestamp válido. Así la instantánea se consume punto a
+    punto y puede liberarse en cuanto se ha ingerido.
+    """
+    for flight_data in flights_in_snapshot:
+        # Este bucle se ejecuta una vez por vuelo y por instantánea: el método
+        # get se enlaza a un nombre local.
+        get = flight_data.get
+        fr24_id = get("fr24_id")
+        if not fr24_id:
+            continue
+        callsign = get("callsign") or get("flight") or None
+
+        lat = get("lat")
+        lon = get("lon")
+        timestamp_str_api = get("timestamp")
+        if lat is None or lon is None or not timestamp_str_api:
+            yield fr24_id, callsign, None
+            continue
+
+        try:
+            ts = parse_fr24_timestamp(timestamp_str_api)
+        except ValueError as e:
+            logging.warning(
+                f"No se pudo parsear el timestamp '{timestamp_str_api}' para FR24 ID {fr24_id}: {e}"
+            )
+            yield fr24_id, callsign, None
+            continue
+
+        # Los valores numéricos se guardan como float (columnas "d"), sin
+        # truncar; un valor no numérico descarta solo este registro.
+        try:
+            point = (
+                ts,
+                float(lat),
+                float(lon),
+                float(get("vspeed") or 0),
+                float(get("alt") or 0),
+                float(get("gspeed") or 0),
+            )
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Valores no numéricos para FR24 ID {fr24_id}: {e}")
+            point = None
+        yield fr24_id, callsign, point
 
 
 def collect_flight_ids_for_day(
@@ -150,131 +500,84 @@ def collect_flight_ids_for_day(
     Recolecta IDs de vuelos, callsigns/flight numbers, y puntos de posición
     para un día específico a intervalos definidos.
     """
-    all_flight_info = defaultdict(lambda: {"positions": [], "callsign_or_flight": None})
+    all_flight_info = defaultdict(new_flight_columns)
     iterations = int((24 * 60) / interval_minutes)
     interval = timedelta(minutes=interval_minutes)
     logging.info(
         f"Comenzando la recolección de IDs, callsigns/flight numbers y posiciones detalladas para el día: {day_start.strftime('%Y-%m-%d')} en la región de EE.UU."
     )
 
-    raw_data_dir = run_output_dir / "raw_snapshots" / day_start.strftime("%Y%m%d")
+    # Todas las instantáneas del día van a un único NDJSON comprimido (una
+    # línea por instantánea) en lugar de un archivo JSON por timestamp.
+    raw_data_dir = run_output_dir / "raw_snapshots"
     raw_data_dir.mkdir(parents=True, exist_ok=True)
+    raw_file_path = raw_data_dir / f"snapshots_{day_start.strftime('%Y%m%d')}.ndjson.gz"
     logging.info(
-        f"Directorio para datos raw del día {day_start.strftime('%Y-%m-%d')}: {raw_data_dir}"
+        f"Archivo de datos raw del día {day_start.strftime('%Y-%m-%d')}: {raw_file_path}"
     )
 
-    for i in range(iterations):
-        ts = int((day_start + i * interval).timestamp())
-        timestamp_utc_dt = datetime.fromtimestamp(ts, timezone.utc)
-        timestamp_str = timestamp_utc_dt.strftime("%Y%m%d_%H%M%S_UTC")
-        logging.info(
-            f"🛰 Solicitando instantánea en {timestamp_utc_dt.strftime('%Y-%m-%d %H:%M:%S UTC')} para EE.UU. ({USA_BOUNDS})"
-        )
-
-        for attempt in range(1, 6):
-            try:
-                r = requests.get(
-                    POSITIONS_URL,
-                    headers=HEADERS,
-                    params={"bounds": USA_BOUNDS, "timestamp": ts},
-                )
-                if r.status_code == 429:
-                    logging.warning(
-                        f"⚠️ Demasiadas solicitudes (429) en el intento {attempt}. Esperando 10 segundos..."
-                    )
-                    time.sleep(10)
-                    continue
-                if r.status_code == 400:
-                    logging.error(
-                        f"❌ Error 400 Bad Request en el timestamp {ts} (Intento {attempt}/5): {r.text}. Posiblemente data no disponible para este timestamp o fuera del rango de la clave API."
-                    )
-                    time.sleep(5)
+    timestamps = [
+        int((day_start + i * interval).timestamp()) for i in range(iterations)
+    ]
+
+    # Las instantáneas se descargan en paralelo; executor.map conserva el orden
+    # cronológico, así que el primer callsign visto sigue siendo el mismo.
+    # La serialización y compresión del archivo raw se hacen en un único hilo
+    # escritor (mantiene el orden de las líneas) fuera del bucle de ingesta.
+    write_futures = []
+    with gzip.open(raw_file_path, "wb", compresslevel=1) as raw_file:
+        with ThreadPoolExecutor(max_workers=1) as writer, ThreadPoolExecutor(
+            max_workers=SNAPSHOT_WORKERS
+        ) as executor:
+            snapshots = executor.map(fetch_snapshot, timestamps)
+
+            for ts, flights_in_snapshot in zip(timestamps, snapshots):
+                if flights_in_snapshot is None:
                     continue
-                r.raise_for_status()
-
-                data = r.json()
-
-                flights_in_snapshot = data.get("positions") or data.get("data") or []
 
                 if flights_in_snapshot:
-                    raw_file_path = raw_data_dir / f"snapshot_{timestamp_str}.json"
-                    with open(raw_file_path, "w", encoding="utf-8") as f:
-                        json.dump(data, f, indent=2)
+                    write_futures.append(
+                        writer.submit(
+                            write_snapshot_line, raw_file, ts, flights_in_snapshot
+                        )
+                    )
 
                 snapshot_fr24_ids = set()
-
-                for flight_data in flights_in_snapshot:
-                    fr24_id = flight_data.get("fr24_id")
-                    if fr24_id:
-                        snapshot_fr24_ids.add(fr24_id)
-                        callsign_or_flight = flight_data.get(
-                            "callsign"
-                        ) or flight_data.get("flight")
-                        if (
-                            callsign_or_flight
-                            and all_flight_info[fr24_id]["callsign_or_flight"] is None
-                        ):
-                            all_flight_info[fr24_id][
-                                "callsign_or_flight"
-                            ] = callsign_or_flight
-
-                        current_lat = flight_data.get("lat")
-                        current_lon = flight_data.get("lon")
-                        current_alt = flight_data.get("alt", 0)
-                        current_gspeed = flight_data.get("gspeed", 0)
-                        current_vspeed = flight_data.get("vspeed", 0)
-                        timestamp_str_api = flight_data.get("timestamp")
-
-                        current_timestamp = None
-                        if timestamp_str_api:
-                            try:
-                                dt_object = datetime.fromisoformat(
-                                    timestamp_str_api.replace("Z", "+00:00")
-                                )
-                                current_timestamp = int(dt_object.timestamp())
-                            except ValueError as e:
-                                logging.warning(
-                                    f"No se pudo parsear el timestamp '{timestamp_str_api}' para FR24 ID {fr24_id}: {e}"
-                                )
-
-                        if (
-                            current_lat is not None
-                            and current_lon is not None
-                            and current_timestamp is not None
-                        ):
-                            position_point = {
-                                "timestamp": current_timestamp,
-                                "latitude": current_lat,
-                                "longitude": current_lon,
-                                "vertical_rate": current_vspeed,
-                                "altitude": current_alt,
-                                "ground_speed": current_gspeed,
-                            }
-                            all_flight_info[fr24_id]["positions"].append(position_point)
+                add_snapshot_id = snapshot_fr24_ids.add
+                for fr24_id, callsign, point in iter_snapshot_points(
+                    flights_in_snapshot
+                ):
+                    add_snapshot_id(fr24_id)
+                    flight = all_flight_info[fr24_id]
+                    if flight["callsign_or_flight"] is None:
+                        flight["callsign_or_flight"] = callsign
+                    if point is None:
+                        continue
+
+                    # p_*: campos del punto; ts es el timestamp de la instantánea
+                    p_ts, p_lat, p_lon, p_vr, p_alt, p_spd = point
+                    seen = flight["seen"]
+                    if p_ts in seen:
+                        continue
+                    seen.add(p_ts)
+                    flight["timestamp"].append(p_ts)
+                    flight["latitude"].append(p_lat)
+                    flight["longitude"].append(p_lon)
+                    flight["vertical_rate"].append(p_vr)
+                    flight["altitude"].append(p_alt)
+                    flight["ground_speed"].append(p_spd)
 
                 logging.info(
                     f"✅ Encontrados {len(snapshot_fr24_ids)} IDs de vuelo en la instantánea."
                 )
-                break
-            except requests.exceptions.RequestException as e:
-                logging.error(
-                    f"Error de red o HTTP al obtener vuelos en el timestamp {ts} (Intento {attempt}/5): {e}"
-                )
-                time.sleep(5)
-            except Exception as e:
-                logging.error(
-                    f"Error inesperado al obtener vuelos en el timestamp {ts} (Intento {attempt}/5): {e}"
-                )
-                time.sleep(5)
-        else:
-            logging.error(f"❌ Fallaron todos los intentos para el timestamp {ts}.")
-        time.sleep(1)
 
-    for fr24_id in all_flight_info:
-        all_flight_info[fr24_id]["positions"].sort(key=lambda p: p["timestamp"])
+    for future in write_futures:
+        future.result()
 
     all_flight_info_filtered = {
-        k: v for k, v in all_flight_info.items() if v["callsign_or_flight"]
+        k: sort_flight_columns(v)
+        for k, v in all_flight_info.items()
+        if v["callsign_or_flight"]
     }
     logging.info(
         f"Después de filtrar, {len(all_flight_info_filtered)} vuelos tienen callsign/flight y serán considerados para resumen."
@@ -288,33 +591,37 @@ def fetch_summaries_from_ids(flight_info_map, day_start, day_end):
     Obtiene resúmenes de vuelos de forma concurrente y reintenta los lotes fallidos.
     """
 
-    def fetch_single_batch(batch_of_fr24_ids):
+    # La ventana de fechas es la misma para todos los lotes del día.
+    summary_datetime_from = (day_start - timedelta(hours=12)).isoformat(
+        timespec="seconds"
+    )
+    summary_datetime_to = (day_end + timedelta(hours=12)).isoformat(timespec="seconds")
+
+    def fetch_single_batch(batch_of_fr24_ids, batch_callsigns_str):
         """Worker function to fetch summaries for a single batch of IDs."""
-        batch_callsigns = [
-            flight_info_map[fid]["callsign_or_flight"] for fid in batch_of_fr24_ids
-        ]
-        batch_callsigns_str = ",".join(batch_callsigns)
-        summary_datetime_from = day_start - timedelta(hours=12)
-        summary_datetime_to = day_end + timedelta(hours=12)
         params = {
             "flights": batch_callsigns_str,
-            "flight_datetime_from": summary_datetime_from.isoformat(timespec="seconds"),
-            "flight_datetime_to": summary_datetime_to.isoformat(timespec="seconds"),
+            "flight_datetime_from": summary_datetime_from,
+            "flight_datetime_to": summary_datetime_to,
             "limit": 100,
         }
         max_retries = 3
         for attempt in range(1, max_retries + 1):
             try:
-                r = requests.get(SUMMARY_URL, headers=HEADERS, params=params)
+                SUMMARY_LIMITER.acquire()
+                r = get_session().get(
+                    SUMMARY_URL, params=params, timeout=REQUEST_TIMEOUT
+                )
                 if r.status_code == 429:
-                    wait_time = 5 * (2 ** (attempt - 1))
+                    wait_time = wait_for_retry(r, backoff_delay(attempt, 5))
+                    first_callsign = batch_callsigns_str.partition(",")[0]
                     logging.warning(
-                        f"⚠️ Demasiadas solicitudes (429) para lote '{batch_callsigns[0]}...'. Esperando {wait_time:.1f}s."
+                        f"⚠️ Demasiadas solicitudes (429) para lote '{first_callsign}...'. Esperando {wait_time:.1f}s."
                     )
-                    time.sleep(wait_time)
+                    SUMMARY_LIMITER.pause(wait_time)
                     continue
                 r.raise_for_status()
-                response_json = r.json()
+                response_json = orjson.loads(r.content)
                 summaries = (
                     response_json.get("data", [])
                     if isinstance(response_json, dict)
@@ -332,47 +639,61 @@ def fetch_summaries_from_ids(flight_info_map, day_start, day_end):
     all_processed_summaries = []
     all_raw_summary_responses = []
     ids_to_process = list(flight_info_map.keys())
-
-    # Initial attempt + 3 retries
-    for attempt in range(1, 5):
-        if not ids_to_process:
-            break
-
-        logging.info(
-            f"🚀 Iniciando obtención de resúmenes. Intento {attempt}/4 para {len(ids_to_process)} IDs."
-        )
-
-        batches = [
-            ids_to_process[i : i + 15] for i in range(0, len(ids_to_process), 15)
-        ]
-        currently_failed_ids = []
-
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_batch = {
-                executor.submit(fetch_single_batch, batch): batch for batch in batches
-            }
-            for future in as_completed(future_to_batch):
+    max_attempts = 4  # Initial attempt + 3 retries
+
+    logging.info(f"🚀 Iniciando obtención de resúmenes para {len(ids_to_process)} IDs.")
+
+    # The API is queried by callsign and returns every flight with that
+    # callsign in the window, so each callsign is requested only once; a
+    # batch carries the fr24_ids behind its callsigns for failure tracking.
+    # collect_flight_ids_for_day only returns flights with a callsign.
+    ids_by_callsign = defaultdict(list)
+    for fid in ids_to_process:
+        ids_by_callsign[flight_info_map[fid]["callsign_or_flight"]].append(fid)
+    unique_callsigns = list(ids_by_callsign)
+
+    # Each batch's callsign string is joined once and reused on every retry.
+    batches = []
+    for i in range(0, len(unique_callsigns), SUMMARY_BATCH_SIZE):
+        callsigns = unique_callsigns[i : i + SUMMARY_BATCH_SIZE]
+        batch = [fid for callsign in callsigns for fid in ids_by_callsign[callsign]]
+        batches.append((batch, ",".join(callsigns)))
+    ids_to_process = []
+
+    # Failed batches are resubmitted as soon as they come back instead of
+    # waiting for the whole round to finish, so the pool never sits idle.
+    with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor:
+        pending = {
+            executor.submit(fetch_single_batch, *batch): (batch, 1) for batch in batches
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch, attempt = pending.pop(future)
+                batch_ids, _ = batch
                 try:
                     raw_response, summaries, failed_ids = future.result()
                     if raw_response:
                         all_raw_summary_responses.append(raw_response)
                     if summaries:
                         all_processed_summaries.extend(summaries)
-                    if failed_ids:
-                        currently_failed_ids.extend(failed_ids)
                 except Exception as e:
-                    batch = future_to_batch[future]
                     logging.critical(
-                        f"❌ Fallo crítico al procesar el futuro para el lote {batch}: {e}",
+                        f"❌ Fallo crítico al procesar el futuro para el lote {batch_ids}: {e}",
                         exc_info=True,
                     )
-                    currently_failed_ids.extend(batch)
+                    failed_ids = batch_ids
 
-        ids_to_process = currently_failed_ids
-        if ids_to_process:
-            logging.warning(
-                f"Fin del intento {attempt}. Quedan {len(ids_to_process)} IDs fallidos. Reintentando..."
-            )
+                if not failed_ids:
+                    continue
+                if attempt < max_attempts:
+                    logging.warning(
+                        f"Lote '{failed_ids[0]}...' fallido en el intento {attempt}/{max_attempts}. Reintentando..."
+                    )
+                    retry = executor.submit(fetch_single_batch, *batch)
+                    pending[retry] = (batch, attempt + 1)
+                else:
+                    ids_to_process.extend(failed_ids)
 
     logging.info(
         f"✅ Finalizada la obtención de resúmenes. Total obtenidos: {len(all_processed_summaries)}."
@@ -385,6 +706,53 @@ def fetch_summaries_from_ids(flight_info_map, day_start, day_end):
     return all_processed_summaries, all_raw_summary_responses, ids_to_process
 
 
+def process_one_flight(fid, flight_data, s):
+    """
+    Calcula distancia, fases, combustible y CO2 de un vuelo a partir de sus
+    columnas de posiciones y su resumen. Devuelve el registro procesado, o
+    None si el vuelo no tiene datos suficientes.
+    """
+    num_points = len(flight_data["timestamp"])
+    if not num_points:
+        return None
+
+    if num_points < MINIMUM_DATA_POINTS:
+        logging.info(
+            f"Saltando vuelo {fid} por tener datos insuficientes ({num_points} puntos)."
+        )
+        return None
+
+    callsign_or_flight = flight_data["callsign_or_flight"]
+
+    dist, durs = compute_flight_metrics(flight_data)
+    pts = flight_points(flight_data)
+
+    model_for_fuel = s.get("type") or s.get("aircraft", {}).get("model") or "default"
+    fuel = estimate_fuel(durs, model_for_fuel)
+    co2_kg = fuel * CO2_PER_KG_FUEL
+    co2 = np.round(co2_kg, 2)
+    seats = SEATS.get(resolve_model(model_for_fuel)) or SEATS.get("default", 150)
+
+    rec = {
+        "fr24_id": fid,
+        "flight": s.get("flight"),
+        "callsign": s.get("callsign") or callsign_or_flight,
+        "aircraft_model": model_for_fuel,
+        "aircraft_reg": s.get("reg"),
+        "departure": s.get("orig_icao"),
+        "arrival": s.get("dest_icao"),
+        "distance_km": dist,
+        "phase_durations_s": durs,
+        "fuel_estimated_kg": dict(zip(PHASES, fuel.tolist())),
+        "co2_estimated_kg": dict(zip(PHASES, co2.tolist())),
+        "co2_total_kg": round(float(co2.sum()), 2),
+        "co2_per_passenger_kg": round(float(co2_kg.sum()) / seats, 2),
+        "raw_flight_path_points": pts,
+        "circle_distance": s.get("circle_distance"),
+    }
+    return rec
+
+
 def process_day(day_start: datetime, run_output_dir: Path):
     """Procesa los datos de vuelos para un día completo, usando la nueva estructura de carpetas."""
     date_str = day_start.strftime("%Y%m%d")
@@ -406,6 +774,7 @@ def process_day(day_start: datetime, run_output_dir: Path):
         accumulated_flight_data, day_start, day_end
     )
     summary_map = {s.get("fr24_id"): s for s in summaries if s.get("fr24_id")}
+    failed_ids = set(failed_ids)
 
     # --- Guardar archivos en la nueva estructura de carpetas ---
     raw_summaries_dir = run_output_dir / "raw_summaries" / day_start.strftime("%Y%m%d")
@@ -419,75 +788,46 @@ def process_day(day_start: datetime, run_output_dir: Path):
         consolidated_raw_summary_file = (
             raw_summaries_dir / f"all_raw_summaries_{date_str}.json"
         )
-        with open(consolidated_raw_summary_file, "w", encoding="utf-8") as f:
-            json.dump(all_raw_summary_responses, f, indent=2)
+        write_json(consolidated_raw_summary_file, all_raw_summary_responses)
 
     summary_file_path = summaries_dir / f"flights_summary_{date_str}.json"
-    with open(summary_file_path, "w", encoding="utf-8") as f:
-        json.dump(summaries, f, indent=2)
+    write_json(summary_file_path, summaries)
     logging.info(f"Resúmenes de vuelos guardados en: {summary_file_path}")
 
     # --- Procesar y enriquecer cada vuelo ---
-    processed_flights = []
-    for fid, flight_data in accumulated_flight_data.items():
-        if fid in failed_ids:
-            continue
-
-        pts = flight_data.get("positions", [])
-        if not pts:
-            continue
-
-        if len(pts) < MINIMUM_DATA_POINTS:
-            logging.info(
-                f"Saltando vuelo {fid} por tener datos insuficientes ({len(pts)} puntos)."
-            )
-            continue
-
-        s = summary_map.get(fid, {})
-        callsign_or_flight = flight_data["callsign_or_flight"]
-
-        coords = [
-            (p["latitude"], p["longitude"])
-            for p in pts
-            if p.get("latitude") is not None
-        ]
-        dist = calculate_distance(coords)
-        durs = detect_phases(pts)
-
-        model_for_fuel = (
-            s.get("type") or s.get("aircraft", {}).get("model") or "default"
+    # Los vuelos son independientes: se procesan en paralelo en varios procesos.
+    flights_to_process = [
+        (fid, flight_data)
+        for fid, flight_data in accumulated_flight_data.items()
+        if fid not in failed_ids
+    ]
+    # Cada worker importa el módulo y construye sus propias tablas de
+    # combustible y asientos, idénticas a las del proceso principal.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as cpu_pool:
+        records = cpu_pool.map(
+            process_one_flight,
+            [fid for fid, _ in flights_to_process],
+            [flight_data for _, flight_data in flights_to_process],
+            [summary_map.get(fid, {}) for fid, _ in flights_to_process],
+            chunksize=64,
         )
-        fuel = estimate_fuel(durs, model_for_fuel)
-        co2_by_phase = {ph: round(fuel[ph] * 3.16, 2) for ph in fuel}
-
-        rec = {
-            "fr24_id": fid,
-            "flight": s.get("flight"),
-            "callsign": s.get("callsign") or callsign_or_flight,
-            "aircraft_model": model_for_fuel,
-            "aircraft_reg": s.get("reg"),
-            "departure": s.get("orig_icao"),
-            "arrival": s.get("dest_icao"),
-            "distance_km": dist,
-            "phase_durations_s": durs,
-            "fuel_estimated_kg": fuel,
-            "co2_estimated_kg": co2_by_phase,
-            "co2_total_kg": round(sum(co2_by_phase.values()), 2),
-            "co2_per_passenger_kg": estimate_co2_by_passenger(fuel, model_for_fuel),
-            "raw_flight_path_points": pts,
-            "circle_distance": s.get("circle_distance"),
-        }
-        processed_flights.append(rec)
-
-        flight_detail_file_path = (
-            detailed_paths_dir / f"{fid}_detailed_path_{date_str}.json"
-        )
-        with open(flight_detail_file_path, "w", encoding="utf-8") as f:
-            json.dump(pts, f, indent=2)
+        processed_flights = [rec for rec in records if rec is not None]
+
+    # Todas las rutas detalladas del día van a un único .npz comprimido, con
+    # un array estructurado por fr24_id, en lugar de un archivo por vuelo.
+    # Para leer una sola ruta: np.load(archivo)[fr24_id].
+    detailed_paths_file = detailed_paths_dir / f"detailed_paths_{date_str}.npz"
+    np.savez_compressed(
+        detailed_paths_file,
+        **{
+            rec["fr24_id"]: flight_path_array(accumulated_flight_data[rec["fr24_id"]])
+            for rec in processed_flights
+        },
+    )
+    logging.info(f"Rutas detalladas guardadas en: {detailed_paths_file}")
 
     processed_file_path = processed_dir / f"flights_processed_{date_str}.json"
-    with open(processed_file_path, "w", encoding="utf-8") as f:
-        json.dump(processed_flights, f, indent=2)
+    write_json(processed_file_path, processed_flights)
     logging.info(f"Datos de vuelos procesados guardados en: {processed_file_path}")
     logging.info(
         f"✅ Finalizado el procesamiento de {len(processed_flights)} vuelos para {date_str}."
@@ -0,0 +1,68 @@
+import os
+import threading
+import orjson
+import requests
+from dotenv import load_dotenv
+from pathlib import Path
+
+dotenv_path = Path(__file__).resolve().parent / ".env"
+load_dotenv(dotenv_path)
+
+api_key = os.environ.get("PROD_FR24_API_KEY")
+
+if not api_key:
+    raise ValueError(
+        "❌ No API key found. Make sure FR24_API_KEY is set in your .env file."
+    )
+
+SUMMARY_URL = "https://fr24api.flightradar24.com/api/flight-summary/full"
+POSITIONS_URL = "https://fr24api.flightradar24.com/api/historic/flight-positions/full"
+REQUEST_TIMEOUT = 30
+
+HEADERS = {
+    "Accept": "application/json",
+    "Accept-Version": "v1",
+    "Authorization": f"Bearer {api_key}",
+}
+
+# One keep-alive session per thread: requests.Session is not guaranteed to be
+# thread-safe, and each worker thread reuses its own connection this way.
+_thread_local = threading.local()
+
+
+def get_session():
+    """Return the current thread's HTTP session, creating it if needed."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        _thread_local.session = session
+    return session
+
+
+def get_json(url, params):
+    """GET url with this thread's session and return the decoded JSON body."""
+    response = get_session().get(url, params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+def fetch_summary(flights, dt_from, dt_to):
+    return get_json(
+        SUMMARY_URL,
+        {
+            "flights": flights,
+            "flight_datetime_from": dt_from,
+            "flight_datetime_to": dt_to,
+        },
+    )
+
+
+def fetch_positions(bounds, timestamp):
+    return get_json(POSITIONS_URL, {"bounds": bounds, "timestamp": timestamp})
+
+
+def write_json(path, obj):
+    """Write obj as indented JSON (these outputs are read by hand)."""
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
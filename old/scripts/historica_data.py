@@ -1,54 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import requests, os, json
-from dotenv import load_dotenv
+import orjson
 from pathlib import Path
-
-dotenv_path = Path(__file__).resolve().parent / ".env"
-load_dotenv(dotenv_path)
-api_key = os.getenv("PROD_FR24_API_KEY")
-if not api_key:
-    raise ValueError("Missing FR24_API_KEY")
+import fr24_client
 
 start_time = datetime.utcnow() - timedelta(days=1)
 interval = timedelta(minutes=10)
 iterations = 6  # 1 hour = 6 intervals of 10 minutes
 
-# Output
-all_flights = []
+# Output: stream every snapshot straight to disk instead of buffering them all
+output_dir = Path("test_data/positions")
+output_dir.mkdir(parents=True, exist_ok=True)
+filename = f"aggregate_positions_{start_time.strftime('%Y%m%d%H%M')}.json"
+total_flights = 0
+
+timestamps = [int((start_time + i * interval).timestamp()) for i in range(iterations)]
+
 
-for i in range(iterations):
-    timestamp = int((start_time + i * interval).timestamp())
+def fetch_snapshot(timestamp):
     print(
         f"⏳ Requesting data for {datetime.utcfromtimestamp(timestamp)} (timestamp={timestamp})"
     )
-
-    url = "https://fr24api.flightradar24.com/api/historic/flight-positions/full"
-    params = {"bounds": "90,-90,-180,180", "timestamp": timestamp}  # Entire globe
-    headers = {
-        "Accept": "application/json",
-        "Accept-Version": "v1",
-        "Authorization": f"Bearer {api_key}",
-    }
-
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        positions = data.get("positions", []) or data.get(
-            "data", []
-        )  # fallback if key is different
-        print(f"✅ {len(positions)} flights at this snapshot")
-
-        all_flights.extend(positions)
-
+        return fr24_client.fetch_positions("90,-90,-180,180", timestamp)  # Entire globe
     except Exception as e:
         print(f"❌ Error at timestamp {timestamp}: {e}")
+        return {}
 
-output_dir = Path("test_data/positions")
-output_dir.mkdir(parents=True, exist_ok=True)
-filename = f"aggregate_positions_{start_time.strftime('%Y%m%d%H%M')}.json"
-with open(output_dir / filename, "w") as f:
-    json.dump(all_flights, f, indent=2)
 
-print(f"📦 Aggregated {len(all_flights)} unique flights across {iterations} snapshots")
+with open(output_dir / filename, "wb") as out:
+    out.write(b"[")
+    try:
+        # The snapshots are independent, so they are requested concurrently, each
+        # thread over its own keep-alive session; map() still hands them back in
+        # timestamp order.
+        with ThreadPoolExecutor(max_workers=iterations) as executor:
+            for data in executor.map(fetch_snapshot, timestamps):
+                if not data:
+                    continue
+                positions = data.get("positions", []) or data.get(
+                    "data", []
+                )  # fallback if key is different
+                print(f"✅ {len(positions)} flights at this snapshot")
+
+                for flight in positions:
+                    if total_flights:
+                        out.write(b",")
+                    out.write(orjson.dumps(flight))
+                    total_flights += 1
+    finally:
+        # Always close the array so the file stays valid JSON for its readers
+        out.write(b"]")
+
+print(f"📦 Aggregated {total_flights} unique flights across {iterations} snapshots")
@@ -1,13 +1,20 @@
 import os
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import logging
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from dotenv import load_dotenv
-from geopy.distance import geodesic
 from collections import defaultdict
 import random
+import bisect
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba es opcional: sin él se usa el kernel NumPy
+    njit = None
 
 # --- Logging config ---
 log_dir = Path("logs")
@@ -40,14 +47,14 @@ POSITIONS_URL = "https://fr24api.flightradar24.com/api/historic/flight-positions
 USA_BOUNDS = "49.38,24.52,-124.77,-66.95"  # North, South, West, East
 
 try:
-    with open("data/fuel_profiles.json", "r") as f:
-        FUEL_PROFILES = json.load(f)
+    with open("data/fuel_profiles.json", "rb") as f:
+        FUEL_PROFILES = orjson.loads(f.read())
 except FileNotFoundError:
     logging.critical(
         "No se encontró 'data/fuel_profiles.json'. Asegúrate de que el archivo existe."
     )
     raise
-except json.JSONDecodeError:
+except orjson.JSONDecodeError:
     logging.critical(
         "Error al decodificar 'data/fuel_profiles.json'. Asegúrate de que es un JSON válido."
     )
@@ -59,17 +66,49 @@ logging.info(f"Directorio de salida configurado en: {out_dir}")
 
 DAYS = 1
 INTERVAL_MINUTES = 240
+# Generador aleatorio de NumPy para las trayectorias simuladas
+RNG = np.random.default_rng()
+# Hilos para escribir los archivos de trayectoria detallada de cada vuelo
+DETAIL_WRITE_WORKERS = 8
+EARTH_RADIUS_KM = 6371.0088
+PHASES = ("takeoff", "climb", "cruise", "descent", "landing")
+CO2_PER_KG_FUEL = 3.16
+
+# Consumo por fase (kg/h, en el orden de PHASES) y asientos de cada modelo,
+# resueltos una sola vez al cargar los perfiles.
+FUEL_RATES = {
+    model: np.array([profile.get(ph, 0) for ph in PHASES], dtype=np.float64)
+    for model, profile in FUEL_PROFILES.items()
+}
+DEFAULT_FUEL_RATES = FUEL_RATES.get("default")
+# Un perfil sin asientos (o con 0) usa 150, como antes.
+SEATS = {
+    model: profile.get("seats", 150) or 150 for model, profile in FUEL_PROFILES.items()
+}
+DEFAULT_SEATS = SEATS.get("default", 150)
+
+
+def write_json(path, obj):
+    """Serializa obj con orjson, indentado como el resto de salidas de la simulación."""
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
 
 
 def calculate_distance(coords):
-    """Calcula la distancia total recorrida a partir de una lista de coordenadas."""
+    """
+    Calcula la distancia total recorrida a partir de una lista de coordenadas.
+    Usa haversine sobre el radio medio terrestre: el error (~0,5 %) frente a
+    la geodésica sobre el elipsoide es irrelevante para estimar combustible.
+    """
     if not coords or len(coords) < 2:
         return 0
     try:
-        distance = round(
-            sum(geodesic(coords[i], coords[i + 1]).km for i in range(len(coords) - 1)),
-            2,
+        lat, lon = np.radians(np.asarray(coords, dtype=np.float64)).T
+        a = (
+            np.sin(np.diff(lat) / 2) ** 2
+            + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
         )
+        distance = round(float((2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).sum()), 2)
         logging.debug(f"Distancia calculada: {distance} km")
         return distance
     except Exception as e:
@@ -77,71 +116,86 @@ def calculate_distance(coords):
         return 0
 
 
+def phase_totals(ts, vr, alt, spd, vr_thr, low_alt):
+    """
+    Segundos por fase (en el orden de PHASES); cada segmento se clasifica
+    según su punto inicial.
+    """
+    dt = np.diff(ts)
+    vr, alt, spd = vr[:-1], alt[:-1], spd[:-1]
+    # Las etiquetas se escriben de menor a mayor prioridad (la última gana):
+    # takeoff > climb > descent > landing > cruise.
+    low = alt < low_alt
+    labels = np.full(len(dt), PHASES.index("cruise"), dtype=np.int8)
+    labels[low & (spd < 50) & (vr < 1)] = PHASES.index("landing")
+    labels[vr < -vr_thr] = PHASES.index("descent")
+    labels[vr > vr_thr] = PHASES.index("climb")
+    labels[(spd > 30) & low & (vr > 1)] = PHASES.index("takeoff")
+    return np.bincount(labels, weights=dt, minlength=len(PHASES))
+
+
+if njit is not None:
+    # Con numba, el mismo kernel se compila como un bucle simple, sin los
+    # arrays temporales de la versión NumPy.
+
+    @njit(cache=True)
+    def phase_totals(ts, vr, alt, spd, vr_thr, low_alt):
+        # Índices según PHASES: takeoff, climb, cruise, descent, landing.
+        totals = np.zeros(5)
+        for i in range(ts.shape[0] - 1):
+            if spd[i] > 30 and alt[i] < low_alt and vr[i] > 1:
+                ph = 0
+            elif vr[i] > vr_thr:
+                ph = 1
+            elif vr[i] < -vr_thr:
+                ph = 3
+            elif alt[i] < low_alt and spd[i] < 50 and vr[i] < 1:
+                ph = 4
+            else:
+                ph = 2
+            totals[ph] += ts[i + 1] - ts[i]
+        return totals
+
+
 def detect_phases(points, vr_thr=3, low_alt=500):
     """Detecta las fases de vuelo (despegue, ascenso, crucero, descenso, aterrizaje) y calcula sus duraciones."""
-    durations = {"takeoff": 0, "climb": 0, "cruise": 0, "descent": 0, "landing": 0}
     if not points:
         logging.warning("No hay puntos para detectar fases de vuelo.")
-        return durations
-
-    for i in range(len(points) - 1):
-        p0, p1 = points[i], points[i + 1]
-        dt = p1["timestamp"] - p0["timestamp"]
-        vr = p0.get("vertical_rate", 0)
-        alt = p0.get("altitude", 0)
-        spd = p0.get("ground_speed", 0)
-
-        # Simplificación de lógica para simulación, puede necesitar ajuste fino
-        if spd > 30 and alt < low_alt and vr > 1:
-            ph = "takeoff"
-        elif vr > vr_thr:
-            ph = "climb"
-        elif vr < -vr_thr:
-            ph = "descent"
-        elif alt < low_alt and spd < 50 and vr < 1:
-            ph = "landing"
-        else:
-            ph = "cruise"
-        durations[ph] += dt
+        return dict.fromkeys(PHASES, 0)
+
+    # Columnas (SoA) con los campos que usa la clasificación.
+    columns = np.array(
+        [
+            (
+                p["timestamp"],
+                p.get("vertical_rate", 0),
+                p.get("altitude", 0),
+                p.get("ground_speed", 0),
+            )
+            for p in points
+        ],
+        dtype=np.float64,
+    )
+    ts, vr, alt, spd = columns.T
+    sums = phase_totals(ts, vr, alt, spd, vr_thr, low_alt)
+    durations = {ph: int(total) for ph, total in zip(PHASES, sums)}
     logging.debug(f"Fases de vuelo detectadas: {durations}")
     return durations
 
 
 def estimate_fuel(durations, model="default"):
-    """Estima el consumo de combustible por fase de vuelo."""
-    fuel_rates = FUEL_PROFILES.get(model, FUEL_PROFILES.get("default"))
-    if not fuel_rates:
-        logging.warning(
-            f"No se encontraron perfiles de combustible para el modelo '{model}'. Usando 'default'."
-        )
-        fuel_rates = FUEL_PROFILES.get("default")
-        if not fuel_rates:
-            logging.error("No se encontró el perfil de combustible 'default'.")
-            return {ph: 0 for ph in durations}
-
-    estimated_fuel = {
-        ph: round((durations[ph] / 3600) * fuel_rates.get(ph, 0), 2) for ph in durations
-    }
+    """Estima el consumo de combustible (kg) por fase, en el orden de PHASES."""
+    fuel_rates = FUEL_RATES.get(model, DEFAULT_FUEL_RATES)
+    if fuel_rates is None:
+        logging.error("No se encontró el perfil de combustible 'default'.")
+        return np.zeros(len(PHASES))
+
+    phase_seconds = np.array([durations[ph] for ph in PHASES], dtype=np.float64)
+    estimated_fuel = np.round(phase_seconds / 3600 * fuel_rates, 2)
     logging.debug(f"Combustible estimado: {estimated_fuel}")
     return estimated_fuel
 
 
-def estimate_co2_by_passenger(fuel_kg, model="default"):
-    """Estima las emisiones de CO2 por pasajero."""
-    co2_total = sum(fuel_kg[ph] * 3.16 for ph in fuel_kg)
-    seats = FUEL_PROFILES.get(model, FUEL_PROFILES["default"]).get("seats", 150)
-    if not seats:
-        logging.warning(
-            f"Número de asientos no definido para el modelo '{model}'. Usando 150 por defecto."
-        )
-        seats = 150
-    co2_per_passenger = round(co2_total / seats, 2)
-    logging.debug(
-        f"CO2 total: {co2_total} kg, CO2 por pasajero: {co2_per_passenger} kg"
-    )
-    return co2_per_passenger
-
-
 # --- SIMULACIÓN DE RESPUESTAS DE API ---
 
 
@@ -165,52 +219,65 @@ def generate_simulated_positions(num_points=50, start_time=None, day_of_interest
                 0, 23 * 3600
             )  # Algún punto aleatorio dentro del día
 
-    points = []
-    current_time = start_time
     total_duration_minutes = 300  # 5 horas de vuelo simulado
     time_per_point_s = (total_duration_minutes * 60) / num_points
 
-    for i in range(num_points):
-        # Interpolación lineal para latitud y longitud
-        interp_factor = i / (num_points - 1)
-        lat = (
-            start_lat
-            + (end_lat - start_lat) * interp_factor
-            + random.uniform(-0.1, 0.1)
-        )  # Pequeña variación
-        lon = (
-            start_lon
-            + (end_lon - start_lon) * interp_factor
-            + random.uniform(-0.1, 0.1)
-        )
+    # Todos los puntos se generan de una vez como columnas NumPy
+    i = np.arange(num_points)
+    timestamps = start_time + i * int(time_per_point_s)
+    current_time = start_time + num_points * int(time_per_point_s)
+
+    # Interpolación lineal para latitud y longitud, con una pequeña variación
+    interp_factor = np.linspace(0, 1, num_points)
+    lat = (
+        start_lat
+        + (end_lat - start_lat) * interp_factor
+        + RNG.uniform(-0.1, 0.1, num_points)
+    )
+    lon = (
+        start_lon
+        + (end_lon - start_lon) * interp_factor
+        + RNG.uniform(-0.1, 0.1, num_points)
+    )
 
-        # Altitud simulada (subida, crucero, bajada)
-        if i < num_points * 0.15:  # Ascenso (primer 15%)
-            alt = 100 + (35000 - 100) * (i / (num_points * 0.15))
-            vspeed = random.uniform(500, 2000)  # pies/min
-            gspeed = random.uniform(150, 400)  # nudos
-        elif i > num_points * 0.85:  # Descenso (último 15%)
-            alt = 35000 - (35000 - 500) * (
-                (i - num_points * 0.85) / (num_points * 0.15)
-            )
-            vspeed = random.uniform(-2000, -500)  # pies/min
-            gspeed = random.uniform(150, 400)  # nudos
-        else:  # Crucero
-            alt = 35000 + random.uniform(-500, 500)
-            vspeed = random.uniform(-50, 50)  # pies/min (pequeñas variaciones)
-            gspeed = random.uniform(450, 550)  # nudos
-
-        points.append(
-            {
-                "timestamp": current_time,
-                "latitude": round(lat, 4),
-                "longitude": round(lon, 4),
-                "vertical_rate": round(vspeed, 2),
-                "altitude": round(alt, 0),
-                "ground_speed": round(gspeed, 0),
-            }
+    # Altitud simulada (subida, crucero, bajada)
+    climbing = i < num_points * 0.15  # Ascenso (primer 15%)
+    descending = i > num_points * 0.85  # Descenso (último 15%)
+    phases = [climbing, descending]  # El resto es crucero
+    alt = np.select(
+        phases,
+        [
+            100 + (35000 - 100) * (i / (num_points * 0.15)),
+            35000 - (35000 - 500) * ((i - num_points * 0.85) / (num_points * 0.15)),
+        ],
+        35000 + RNG.uniform(-500, 500, num_points),
+    )
+    # Velocidades uniformes entre los límites de cada fase
+    vspeed = RNG.uniform(
+        np.select(phases, [500, -2000], -50), np.select(phases, [2000, -500], 50)
+    )  # pies/min
+    gspeed = RNG.uniform(
+        np.select(phases, [150, 150], 450), np.select(phases, [400, 400], 550)
+    )  # nudos
+
+    points = [
+        {
+            "timestamp": ts,
+            "latitude": la,
+            "longitude": lo,
+            "vertical_rate": vs,
+            "altitude": al,
+            "ground_speed": gs,
+        }
+        for ts, la, lo, vs, al, gs in zip(
+            timestamps.tolist(),
+            np.round(lat, 4).tolist(),
+            np.round(lon, 4).tolist(),
+            np.round(vspeed, 2).tolist(),
+            np.round(alt, 0).tolist(),
+            np.round(gspeed, 0).tolist(),
         )
-        current_time += int(time_per_point_s)
+    ]
 
     # Asegurar que el último punto no exceda el día de interés si se especificó
     if day_of_interest and current_time >= day_end_ts:
@@ -250,9 +317,7 @@ def generate_simulated_summary(fr24_id, callsign_or_flight):
         "type": model,  # Tipo de aeronave
         "aircraft": {
             "model": model,  # Modelo de aeronave
-            "seats": FUEL_PROFILES.get(model, FUEL_PROFILES["default"]).get(
-                "seats", 150
-            ),  # Usar los asientos del perfil
+            "seats": SEATS.get(model, DEFAULT_SEATS),  # Usar los asientos del perfil
         },
         "reg": f"N{random.randint(100, 999)}{random.choice('AZQWERTY')}",  # Matrícula simulada
         "orig_icao": orig,
@@ -272,6 +337,8 @@ def collect_flight_ids_for_day_simulated(day_start: datetime, interval_minutes:
     para un día específico a intervalos definidos, sin llamadas a la API.
     """
     all_flight_info = defaultdict(lambda: {"positions": [], "callsign_or_flight": None})
+    day_start_ts = day_start.timestamp()
+    day_end_ts = (day_start + timedelta(days=1)).timestamp()
     iterations = int((24 * 60) / interval_minutes)
     interval = timedelta(minutes=interval_minutes)
     logging.info(
@@ -287,50 +354,52 @@ def collect_flight_ids_for_day_simulated(day_start: datetime, interval_minutes:
         fr24_id = f"sim_id_{day_start.strftime('%Y%m%d')}_{i}"
         callsign = f"SIM{random.randint(100,999)}"
         # Generar puntos para un vuelo completo o que cruce varias instantáneas
-        start_ts = int(day_start.timestamp()) + random.randint(
+        start_ts = int(day_start_ts) + random.randint(
             0, (24 * 60 * 60) - 3600
         )  # Vuelo empieza aleatoriamente dentro del día
+        full_positions = generate_simulated_positions(
+            num_points=random.randint(30, 80),
+            start_time=start_ts,
+            day_of_interest=day_start,
+        )
+        # Filtrar una sola vez los puntos relevantes para el día
+        valid_positions = [
+            p for p in full_positions if day_start_ts <= p["timestamp"] < day_end_ts
+        ]
         simulated_flights_for_day[fr24_id] = {
             "callsign_or_flight": callsign,
-            "full_positions": generate_simulated_positions(
-                num_points=random.randint(30, 80),
-                start_time=start_ts,
-                day_of_interest=day_start,
-            ),
+            "valid_positions": valid_positions,
+            # Los puntos se generan en orden temporal: sus timestamps sirven para bisect
+            "timestamps": [p["timestamp"] for p in valid_positions],
         }
 
+    log_info = logging.info
     for i in range(iterations):
         current_snapshot_time_ts = int((day_start + i * interval).timestamp())
         timestamp_utc_dt = datetime.fromtimestamp(
             current_snapshot_time_ts, timezone.utc
         )
-        logging.info(
+        log_info(
             f"SIMULADO: Generando instantánea simulada en {timestamp_utc_dt.strftime('%Y-%m-%d %H:%M:%S UTC')}"
         )
 
         flights_in_snapshot = []
         for fr24_id, flight_data in simulated_flights_for_day.items():
             callsign_or_flight = flight_data["callsign_or_flight"]
-            full_positions = flight_data["full_positions"]
+            valid_positions_for_day = flight_data["valid_positions"]
+            timestamps = flight_data["timestamps"]
 
-            # Encontrar el punto de posición más cercano al timestamp actual de la instantánea
+            # Encontrar el punto de posición más cercano al timestamp actual de la instantánea:
+            # es el de la posición de inserción o el anterior (el anterior gana en empate)
             closest_point = None
             min_time_diff = float("inf")
-
-            # Filtrar solo los puntos relevantes para el día
-            valid_positions_for_day = [
-                p
-                for p in full_positions
-                if day_start.timestamp()
-                <= p["timestamp"]
-                < (day_start + timedelta(days=1)).timestamp()
-            ]
-
-            for p in valid_positions_for_day:
-                time_diff = abs(p["timestamp"] - current_snapshot_time_ts)
-                if time_diff < min_time_diff:
-                    min_time_diff = time_diff
-                    closest_point = p
+            idx = bisect.bisect_left(timestamps, current_snapshot_time_ts)
+            for j in (idx - 1, idx):
+                if 0 <= j < len(timestamps):
+                    time_diff = abs(timestamps[j] - current_snapshot_time_ts)
+                    if time_diff < min_time_diff:
+                        min_time_diff = time_diff
+                        closest_point = valid_positions_for_day[j]
 
             # Si el punto está "suficientemente" cerca del timestamp de la instantánea (ej. dentro del intervalo)
             if (
@@ -355,29 +424,20 @@ def collect_flight_ids_for_day_simulated(day_start: datetime, interval_minutes:
                 # Acumular todos los puntos del vuelo completo en all_flight_info
                 # Esto es clave: para los cálculos finales necesitamos la trayectoria completa
                 # no solo los puntos que caen en las instantáneas.
+                # La trayectoria simulada ya está completa, limitada al día, ordenada y
+                # sin duplicados: basta con asignarla la primera vez que se ve el vuelo.
                 if all_flight_info[fr24_id]["callsign_or_flight"] is None:
                     all_flight_info[fr24_id]["callsign_or_flight"] = callsign_or_flight
+                    all_flight_info[fr24_id]["positions"] = list(
+                        valid_positions_for_day
+                    )
 
-                # Asegúrate de que solo se añaden puntos dentro del día de interés
-                for p in full_positions:
-                    if (
-                        day_start.timestamp()
-                        <= p["timestamp"]
-                        < (day_start + timedelta(days=1)).timestamp()
-                    ):
-                        # Evitar duplicados si ya se añadió el punto en una iteración anterior
-                        if p not in all_flight_info[fr24_id]["positions"]:
-                            all_flight_info[fr24_id]["positions"].append(p)
-
-        logging.info(
+        log_info(
             f"SIMULADO: Encontrados {len(flights_in_snapshot)} IDs de vuelo en la instantánea simulada."
         )
         # No guardamos datos raw de instantáneas simuladas para simplificar.
         time.sleep(0.1)  # Pequeña pausa para simular el tiempo de procesamiento
 
-    for fr24_id in all_flight_info:
-        all_flight_info[fr24_id]["positions"].sort(key=lambda p: p["timestamp"])
-
     total_accumulated_points = sum(
         len(v["positions"]) for v in all_flight_info.values()
     )
@@ -437,6 +497,20 @@ def fetch_summaries_from_ids_simulated(flight_info_map, day_start, day_end):
 # --- FIN SIMULACIÓN DE RESPUESTAS DE API ---
 
 
+def save_detailed_path(fid, pts, date_str):
+    """Guarda los puntos de posición de un vuelo en su propio archivo JSON."""
+    flight_detail_file_path = out_dir / f"{fid}_detailed_path_{date_str}.json"
+    try:
+        write_json(flight_detail_file_path, pts)
+        logging.debug(
+            f"Puntos de posición detallados (simulados) para el vuelo {fid} guardados en: {flight_detail_file_path}"
+        )
+    except IOError as e:
+        logging.error(
+            f"Error al guardar los puntos de posición del vuelo {fid} en {flight_detail_file_path}: {e}"
+        )
+
+
 def process_day(day_start: datetime):
     """Procesa los datos de vuelos para un día completo, usando datos de posición acumulados."""
     date_str = day_start.strftime("%Y%m%d")
@@ -483,8 +557,7 @@ def process_day(day_start: datetime):
             raw_summaries_dir / f"all_raw_summaries_{date_str}.json"
         )
         try:
-            with open(consolidated_raw_summary_file, "w", encoding="utf-8") as f:
-                json.dump(all_raw_summary_responses, f, indent=2)
+            write_json(consolidated_raw_summary_file, all_raw_summary_responses)
             logging.info(
                 f"Todas las respuestas raw de los resúmenes del día guardadas en: {consolidated_raw_summary_file}"
             )
@@ -500,8 +573,7 @@ def process_day(day_start: datetime):
 
     summary_file_path = out_dir / f"flights_summary_{date_str}.json"
     try:
-        with open(summary_file_path, "w", encoding="utf-8") as f:
-            json.dump(summaries, f, indent=2)
+        write_json(summary_file_path, summaries)
         logging.info(
             f"Resúmenes de vuelos combinados (simulados) guardados en: {summary_file_path}"
         )
@@ -515,6 +587,7 @@ def process_day(day_start: datetime):
         f"Procesando {len(accumulated_flight_data)} vuelos con datos de posición acumulados para enriquecerlos con resúmenes."
     )
 
+    detailed_paths = []
     for fid, flight_data in accumulated_flight_data.items():
         pts = flight_data["positions"]  # Obtener solo las posiciones
         callsign_or_flight = flight_data[
@@ -552,10 +625,11 @@ def process_day(day_start: datetime):
         # Priorizar el modelo del resumen simulado si está disponible
         model_for_fuel = aircraft_model or aircraft_type_from_summary or "default"
 
+        # Combustible y CO2 como vectores por fase: se pasan a dict solo al final
         fuel = estimate_fuel(durs, model_for_fuel)
-        co2_by_phase = {ph: round(fuel[ph] * 3.16, 2) for ph in fuel}
-        co2_total = round(sum(co2_by_phase.values()), 2)
-        co2_per_passenger = estimate_co2_by_passenger(fuel, model_for_fuel)
+        co2_kg = fuel * CO2_PER_KG_FUEL
+        co2 = np.round(co2_kg, 2)
+        seats = SEATS.get(model_for_fuel, DEFAULT_SEATS)
 
         rec = {
             "fr24_id": fid,
@@ -567,33 +641,33 @@ def process_day(day_start: datetime):
             "arrival": s.get("dest_icao"),
             "distance_km": dist,
             "phase_durations_s": durs,
-            "fuel_estimated_kg": fuel,
-            "co2_estimated_kg": co2_by_phase,
-            "co2_total_kg": co2_total,
-            "co2_per_passenger_kg": co2_per_passenger,
+            "fuel_estimated_kg": dict(zip(PHASES, fuel.tolist())),
+            "co2_estimated_kg": dict(zip(PHASES, co2.tolist())),
+            "co2_total_kg": round(float(co2.sum()), 2),
+            "co2_per_passenger_kg": round(float(co2_kg.sum()) / seats, 2),
             "raw_flight_path_points": pts,
         }
         processed_flights.append(rec)
 
-        # Guarda los puntos detallados simulados
-        flight_detail_file_path = out_dir / f"{fid}_detailed_path_{date_str}.json"
-        try:
-            with open(flight_detail_file_path, "w", encoding="utf-8") as f:
-                json.dump(pts, f, indent=2)
-            logging.debug(
-                f"Puntos de posición detallados (simulados) para el vuelo {fid} guardados en: {flight_detail_file_path}"
-            )
-        except IOError as e:
-            logging.error(
-                f"Error al guardar los puntos de posición del vuelo {fid} en {flight_detail_file_path}: {e}"
-            )
+        detailed_paths.append((fid, pts))
+
+    # Guarda los puntos detallados simulados: un archivo pequeño por vuelo,
+    # escritos en paralelo (la E/S libera el GIL)
+    # .result() propaga cualquier error que no sea de E/S, igual que antes de
+    # paralelizar las escrituras
+    with ThreadPoolExecutor(max_workers=DETAIL_WRITE_WORKERS) as executor:
+        futures = [
+            executor.submit(save_detailed_path, fid, pts, date_str)
+            for fid, pts in detailed_paths
+        ]
+        for future in futures:
+            future.result()
 
     time.sleep(0.1)  # Pequeña pausa para simular el tiempo de procesamiento
 
     processed_file_path = out_dir / f"flights_processed_{date_str}.json"
     try:
-        with open(processed_file_path, "w", encoding="utf-8") as f:
-            json.dump(processed_flights, f, indent=2)
+        write_json(processed_file_path, processed_flights)
         logging.info(
             f"Datos de vuelos procesados (simulados) guardados en: {processed_file_path}"
         )
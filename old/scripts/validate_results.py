@@ -1,10 +1,18 @@
-import json
+import ijson
+import orjson
 from collections import defaultdict
 
+INPUT_FILE = "data/positions/aggregate_positions_202507021645.json"
 
-def open_test_file():
-    with open("data/positions/aggregate_positions_202507021645.json") as f:
-        return json.load(f)
+
+def iter_flights(path):
+    """
+    Yields the flight entries of an aggregate positions file one at a time,
+    parsing the top-level JSON array incrementally instead of loading it whole.
+    use_float keeps numbers as floats (orjson cannot serialize Decimal).
+    """
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "item", use_float=True)
 
 
 def organize_flight_data(data):
@@ -14,13 +22,14 @@ def organize_flight_data(data):
     historical flight data (without the 'fr24_id' key in the historical entries).
 
     Args:
-        data (list of dict): A list of flight dictionaries, where each dictionary
-                             is expected to have an 'fr24_id' key.
+        data (iterable of dict): Flight dictionaries, where each dictionary
+                               is expected to have an 'fr24_id' key.
 
     Returns:
         defaultdict: An organized dictionary of flight data.
     """
     organized_data = defaultdict(lambda: {"fr24_id": None, "historical": []})
+    setdefault = organized_data.setdefault  # bound once for the loop
 
     for flight in data:
         fr24_id = flight.get("fr24_id")
@@ -31,30 +40,38 @@ def organize_flight_data(data):
 
         # Use setdefault to initialize the dictionary for fr24_id if it doesn't exist
         # This is more concise than the 'if not in' check
-        current_flight_data = organized_data.setdefault(
+        current_flight_data = setdefault(
             fr24_id, {"fr24_id": fr24_id, "historical": []}
         )
 
-        # Remove 'fr24_id' from the flight dictionary before appending to historical
-        # Create a copy to avoid modifying the original 'flight' dictionary
-        flight_copy = flight.copy()
-        flight_copy.pop(
-            "fr24_id", None
-        )  # Use None as default to prevent KeyError if already popped
+        # Historical entries are built without 'fr24_id' in a single pass,
+        # leaving the original 'flight' dictionary untouched
+        current_flight_data["historical"].append(
+            {k: v for k, v in flight.items() if k != "fr24_id"}
+        )
 
-        current_flight_data["historical"].append(flight_copy)
+    return organized_data
 
-        # Ensure 'fr24_id' is correctly set in the top-level dictionary
-        current_flight_data["fr24_id"] = fr24_id
 
-    return organized_data
+def write_organized(path, organized_data):
+    """
+    Writes the organized data one flight at a time ('fr24_id': {...} per line),
+    so the whole output is never held in memory as a single JSON string.
+    """
+    with open(path, "wb") as f:
+        f.write(b"{")
+        for i, (fr24_id, flight_data) in enumerate(organized_data.items()):
+            f.write(b",\n" if i else b"\n")
+            f.write(orjson.dumps(fr24_id) + b": " + orjson.dumps(flight_data))
+        f.write(b"\n}\n")
 
 
 if __name__ == "__main__":
-    data = open_test_file()
-    organized_data = organize_flight_data(data)
+    # Entries are grouped as they are parsed, so the raw input list is never
+    # held in memory alongside the organized output
+    organized_data = organize_flight_data(iter_flights(INPUT_FILE))
 
-    with open(
-        "data/positions/aggregate_positions_202507021645_organized.json", "w"
-    ) as f:
-        json.dump(organized_data, f, indent=2)
+    write_organized(
+        "data/positions/aggregate_positions_202507021645_organized.json",
+        organized_data,
+    )
@@ -1,12 +1,14 @@
-import json
+import orjson
 import logging
 import argparse
 from pathlib import Path
 from collections import defaultdict
-from datetime import datetime, timezone
+from operator import itemgetter
 from tqdm import tqdm
 import config
 
+by_timestamp = itemgetter("timestamp")
+
 
 def main():
     config.setup_logging()
@@ -34,8 +36,7 @@ def main():
         )
         return
 
-    with open(summary_file, "r") as f:
-        summaries = json.load(f)
+    summaries = config.read_json(summary_file)
     id_to_callsign_map = {
         s["fr24_id"]: s.get("callsign") or s.get("flight") for s in summaries
     }
@@ -46,16 +47,15 @@ def main():
     logging.info("--- Iniciando Ensamblaje de Rutas ---")
     pbar = tqdm(snapshot_files, desc="🧩 Assembling Paths")
     for snapshot_file in pbar:
-        with open(snapshot_file, "r") as f:
-            try:
-                data = json.load(f)
-                positions = data.get("positions", []) or data.get("data", [])
-                for pos in positions:
-                    fr24_id = pos.get("fr24_id")
-                    if fr24_id:
-                        flight_paths[fr24_id].append(pos)
-            except json.JSONDecodeError:
-                logging.warning(f"Could not decode JSON from file: {snapshot_file}")
+        try:
+            data = config.read_json(snapshot_file)
+            positions = data.get("positions", []) or data.get("data", [])
+            for pos in positions:
+                fr24_id = pos.get("fr24_id")
+                if fr24_id:
+                    flight_paths[fr24_id].append(pos)
+        except orjson.JSONDecodeError:
+            logging.warning(f"Could not decode JSON from file: {snapshot_file}")
 
     logging.info(
         f"Ensamblaje completado. Se encontraron datos para {len(flight_paths)} vuelos únicos."
@@ -64,15 +64,14 @@ def main():
     flight_details_map = {}
     for fr24_id, positions in flight_paths.items():
         unique_positions = {p["timestamp"]: p for p in positions}.values()
-        sorted_positions = sorted(unique_positions, key=lambda p: p["timestamp"])
+        sorted_positions = sorted(unique_positions, key=by_timestamp)
 
         reformatted_positions = []
         for p in sorted_positions:
             try:
                 ts_str = p.get("timestamp")
                 if isinstance(ts_str, str):
-                    dt_obj = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-                    timestamp_int = int(dt_obj.timestamp())
+                    timestamp_int = config.parse_utc_timestamp(ts_str)
                 else:
                     timestamp_int = int(ts_str)
 
@@ -96,8 +95,7 @@ def main():
 
     date_str = run_dir.name.split("_")[1]
     output_file = run_dir / f"flight_details_map_{date_str}.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(flight_details_map, f, indent=2)
+    config.write_json(output_file, flight_details_map)
 
     logging.info(f"✅ Archivo final 'flight_details_map.json' creado en {run_dir}")
 
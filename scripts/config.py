@@ -1,7 +1,11 @@
 import os
-import json
+import calendar
+import orjson
 import logging
+import requests
 from pathlib import Path
+from functools import lru_cache
+from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,6 +19,12 @@ HEADERS = {
     "Authorization": f"Bearer {API_KEY}",
 }
 
+# Shared keep-alive session so consecutive API calls reuse the same TLS connection.
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+# Seconds to wait for the API; without it a stalled connection blocks forever.
+REQUEST_TIMEOUT = 30
+
 SUMMARY_URL = "https://fr24api.flightradar24.com/api/flight-summary/full"
 POSITIONS_URL = "https://fr24api.flightradar24.com/api/historic/flight-positions/full"
 
@@ -22,17 +32,54 @@ TOTAL_FLIGHTS_TO_PROCESS = 100
 USA_BOUNDS = "49.38,24.52,-124.77,-66.95"
 
 MINIMUM_DATA_POINTS = 5
+EARTH_RADIUS_KM = 6371.0088  # Mean radius, used by the haversine distance
 BASE_OUTPUT_DIR = Path("data/flights")
 LOG_DIR = Path("logs")
 
 try:
-    with open("data/fuel_profiles.json", "r") as f:
-        FUEL_PROFILES = json.load(f)
-except (FileNotFoundError, json.JSONDecodeError) as e:
+    with open("data/fuel_profiles.json", "rb") as f:
+        FUEL_PROFILES = orjson.loads(f.read())
+except (FileNotFoundError, orjson.JSONDecodeError) as e:
     logging.critical(f"Could not load 'data/fuel_profiles.json': {e}")
     raise
 
 
+@lru_cache(maxsize=65536)
+def parse_utc_timestamp(value):
+    """Epoch seconds for an FR24 ISO-8601 timestamp.
+
+    FR24 always sends the fixed-width 'YYYY-MM-DDTHH:MM:SSZ' form, which is
+    sliced directly; anything else falls back to datetime.fromisoformat.
+    Positions share few distinct timestamps, so results are memoized.
+    """
+    if len(value) == 20 and value[10] == "T" and value[19] == "Z":
+        return calendar.timegm(
+            (
+                int(value[0:4]),
+                int(value[5:7]),
+                int(value[8:10]),
+                int(value[11:13]),
+                int(value[14:16]),
+                int(value[17:19]),
+            )
+        )
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+
+def read_json(path):
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def write_json(path, obj, pretty=False):
+    """Write obj with orjson; compact unless pretty (NumPy values allowed)."""
+    option = orjson.OPT_SERIALIZE_NUMPY
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(obj, option=option))
+
+
 def setup_logging():
     LOG_DIR.mkdir(exist_ok=True)
     logging.basicConfig(
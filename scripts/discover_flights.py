@@ -1,5 +1,5 @@
 import time
-import json
+import orjson
 import logging
 import requests
 from datetime import datetime, timedelta, timezone
@@ -31,11 +31,11 @@ def discover_flight_ids(target_count, target_dates):
 
             try:
                 params = {"bounds": config.USA_BOUNDS, "timestamp": ts}
-                r = requests.get(
-                    config.POSITIONS_URL, headers=config.HEADERS, params=params
+                r = config.SESSION.get(
+                    config.POSITIONS_URL, params=params, timeout=config.REQUEST_TIMEOUT
                 )
                 r.raise_for_status()
-                data = r.json()
+                data = orjson.loads(r.content)
 
                 flights_in_snapshot = data.get("positions", []) or data.get("data", [])
 
@@ -79,8 +79,7 @@ def main():
     run_output_dir.mkdir(parents=True, exist_ok=True)
 
     output_file = run_output_dir / "discovered_ids.json"
-    with open(output_file, "w") as f:
-        json.dump(discovered_ids, f, indent=2)
+    config.write_json(output_file, discovered_ids)
 
     logging.info(
         f"✅ Descubrimiento completo. Se guardaron {len(discovered_ids)} IDs en {output_file}"
@@ -1,4 +1,4 @@
-import json
+import orjson
 import logging
 import argparse
 import requests
@@ -11,9 +11,11 @@ import config
 def get_summaries_for_batch(id_batch):
     try:
         params = {"flight_ids": ",".join(id_batch)}
-        r = requests.get(config.SUMMARY_URL, headers=config.HEADERS, params=params)
+        r = config.SESSION.get(
+            config.SUMMARY_URL, params=params, timeout=config.REQUEST_TIMEOUT
+        )
         r.raise_for_status()
-        return r.json().get("data", [])
+        return orjson.loads(r.content).get("data", [])
     except requests.RequestException as e:
         logging.error(f"Failed to get summary for batch {id_batch[0]}...: {e}")
         return []
@@ -39,8 +41,7 @@ def main():
         )
         return
 
-    with open(id_file, "r") as f:
-        discovered_ids = json.load(f)
+    discovered_ids = config.read_json(id_file)
 
     flights_to_process = discovered_ids[: config.TOTAL_FLIGHTS_TO_PROCESS]
     logging.info(
@@ -67,8 +68,7 @@ def main():
     summaries_dir.mkdir(parents=True, exist_ok=True)
     date_str = run_dir.name.split("_")[1]
     summary_file_path = summaries_dir / f"flights_summary_{date_str}.json"
-    with open(summary_file_path, "w", encoding="utf-8") as f:
-        json.dump(all_summaries, f, indent=2)
+    config.write_json(summary_file_path, all_summaries)
 
     logging.info(
         f"✅ Successfully retrieved and saved {len(all_summaries)} summaries to {summary_file_path}"
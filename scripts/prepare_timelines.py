@@ -1,8 +1,6 @@
-import json
 import logging
 import argparse
 from pathlib import Path
-from datetime import datetime
 import config
 
 
@@ -25,8 +23,7 @@ def main():
         return
 
     logging.info(f"Reading summaries from: {summary_file}")
-    with open(summary_file, "r", encoding="utf-8") as f:
-        summaries = json.load(f)
+    summaries = config.read_json(summary_file)
 
     timelines = []
     for summary in summaries:
@@ -39,14 +36,8 @@ def main():
             continue
 
         try:
-            start_ts = int(
-                datetime.fromisoformat(
-                    first_seen_str.replace("Z", "+00:00")
-                ).timestamp()
-            )
-            end_ts = int(
-                datetime.fromisoformat(last_seen_str.replace("Z", "+00:00")).timestamp()
-            )
+            start_ts = config.parse_utc_timestamp(first_seen_str)
+            end_ts = config.parse_utc_timestamp(last_seen_str)
 
             timelines.append(
                 {
@@ -60,8 +51,7 @@ def main():
             continue
 
     output_file = run_dir / "flight_timelines.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(timelines, f, indent=2)
+    config.write_json(output_file, timelines)
 
     logging.info(f"✅ Timelines prepared for {len(timelines)} flights.")
     logging.info(f"-> Saved to {output_file}")
@@ -1,53 +1,189 @@
-import json
+import re
 import logging
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from datetime import datetime, timezone
 from typing import Optional
-from geopy.distance import geodesic
+import numpy as np
 from tqdm import tqdm
 import config
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the NumPy kernel is used without it
+    njit = None
 
-def detect_phases(points, vr_thr=3, low_alt=500):
-    durations = {"takeoff": 0, "climb": 0, "cruise": 0, "descent": 0, "landing": 0}
-    if not points:
-        return durations
+PHASES = ("takeoff", "climb", "cruise", "descent", "landing")
+CO2_PER_KG_FUEL = 3.16
+# Bound at module level so the numba kernel sees it as a constant.
+EARTH_RADIUS_KM = config.EARTH_RADIUS_KM
 
+# Per-model fuel burn (kg/h for each phase) and seat counts, resolved once.
+FUEL_RATES = {
+    model: np.array([profile.get(ph, 0) for ph in PHASES], dtype=np.float64)
+    for model, profile in config.FUEL_PROFILES.items()
+}
+DEFAULT_FUEL_RATES = FUEL_RATES.get("default", np.zeros(len(PHASES)))
+SEATS = {
+    model: profile.get("seats", 150) for model, profile in config.FUEL_PROFILES.items()
+}
+DEFAULT_SEATS = SEATS.get("default", 150)
+
+
+def model_key(model):
+    """Normalize an FR24 type code to bare upper case ("b-738" -> "B738")."""
+    return re.sub(r"[^A-Z0-9]", "", model.upper())
+
+
+PROFILE_KEYS = {model_key(model): model for model in config.FUEL_PROFILES}
+
+
+@lru_cache(maxsize=1024)
+def resolve_model(model):
+    """FUEL_PROFILES key for an FR24 aircraft type, or "default" if unknown."""
+    return PROFILE_KEYS.get(model_key(model or ""), "default")
+
+
+POSITION_DTYPE = np.dtype(
+    [
+        ("timestamp", "i8"),
+        ("latitude", "f8"),
+        ("longitude", "f8"),
+        ("vertical_rate", "f8"),
+        ("altitude", "f8"),
+        ("ground_speed", "f8"),
+    ]
+)
+
+
+def coordinate(point, key):
+    """Latitude/longitude of a point, or NaN when it is missing or null."""
+    value = point.get(key)
+    return np.nan if value is None else value
+
+
+def position_array(points):
+    """Pack a flight's position dicts into one structured NumPy array sorted by
+    timestamp. Fields are read by name (e.g. positions["altitude"]) by the
+    distance and phase calculations; missing values become NaN."""
     for p in points:
         if isinstance(p["timestamp"], str):
             try:
-                p["timestamp"] = int(
-                    datetime.fromisoformat(
-                        p["timestamp"].replace("Z", "+00:00")
-                    ).timestamp()
-                )
+                p["timestamp"] = config.parse_utc_timestamp(p["timestamp"])
             except (ValueError, TypeError):
                 pass
 
-    for i in range(len(points) - 1):
-        p0, p1 = points[i], points[i + 1]
-        dt = p1["timestamp"] - p0["timestamp"]
-        vr = p0.get("vertical_rate", 0)
-        alt = p0.get("altitude", 0)
-        spd = p0.get("ground_speed", 0)
-
-        if alt < low_alt and spd > 30 and vr > 1:
-            ph = "takeoff"
-        elif alt < low_alt and spd < 50 and vr < 1:
-            ph = "landing"
-        elif vr > vr_thr:
-            ph = "climb"
-        elif vr < -vr_thr:
-            ph = "descent"
-        else:
-            ph = "cruise"
-        durations[ph] += dt
+    positions = np.fromiter(
+        (
+            (
+                p["timestamp"],
+                coordinate(p, "latitude"),
+                coordinate(p, "longitude"),
+                p.get("vertical_rate", 0),
+                p.get("altitude", 0),
+                p.get("ground_speed", 0),
+            )
+            for p in points
+        ),
+        dtype=POSITION_DTYPE,
+        count=len(points),
+    )
+    # assemble_flights.py writes positions already in timestamp order.
+    ts = positions["timestamp"]
+    if not (ts[1:] >= ts[:-1]).all():
+        positions.sort(order="timestamp", kind="stable")
+    return positions
+
+
+def flight_totals(ts, lat, lon, vr, alt, spd, vr_thr, low_alt):
+    """Path distance (km) and seconds per phase, in PHASES order.
+
+    lat/lon are in radians; points without coordinates (NaN) are skipped for
+    the distance. Each segment is labelled by its starting point, so the last
+    point only contributes its timestamp.
+    """
+    has_coords = ~np.isnan(lat)
+    lat, lon = lat[has_coords], lon[has_coords]
+    a = (
+        np.sin(np.diff(lat) / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    )
+    distance = float((2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).sum())
+
+    dt = np.diff(ts)
+    vr, alt, spd = vr[:-1], alt[:-1], spd[:-1]
+    # Labels are written from lowest to highest priority, so later writes win:
+    # takeoff > landing > climb > descent > cruise.
+    low = alt < low_alt
+    labels = np.full(len(dt), PHASES.index("cruise"), dtype=np.int8)
+    labels[vr < -vr_thr] = PHASES.index("descent")
+    labels[vr > vr_thr] = PHASES.index("climb")
+    labels[low & (spd < 50) & (vr < 1)] = PHASES.index("landing")
+    labels[low & (spd > 30) & (vr > 1)] = PHASES.index("takeoff")
+    return distance, np.bincount(labels, weights=dt, minlength=len(PHASES))
+
+
+if njit is not None:
+    # With numba the same kernel compiles to one loop over the points, with
+    # none of the temporary arrays of the NumPy version.
+
+    @njit(cache=True)
+    def flight_totals(ts, lat, lon, vr, alt, spd, vr_thr, low_alt):
+        distance = 0.0
+        prev = -1
+        # Indices follow PHASES: takeoff, climb, cruise, descent, landing.
+        totals = np.zeros(5)
+        for i in range(ts.shape[0]):
+            if not np.isnan(lat[i]):
+                if prev >= 0:
+                    a = (
+                        np.sin((lat[i] - lat[prev]) / 2) ** 2
+                        + np.cos(lat[prev])
+                        * np.cos(lat[i])
+                        * np.sin((lon[i] - lon[prev]) / 2) ** 2
+                    )
+                    distance += 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+                prev = i
+
+            if i == ts.shape[0] - 1:
+                break
+            low = alt[i] < low_alt
+            if low and spd[i] > 30 and vr[i] > 1:
+                ph = 0
+            elif low and spd[i] < 50 and vr[i] < 1:
+                ph = 4
+            elif vr[i] > vr_thr:
+                ph = 1
+            elif vr[i] < -vr_thr:
+                ph = 3
+            else:
+                ph = 2
+            totals[ph] += ts[i + 1] - ts[i]
+        return distance, totals
+
+
+def flight_metrics(positions, vr_thr=3, low_alt=500):
+    """Distance (km) and phase durations (s) for a structured position array."""
+    if not len(positions):
+        return 0, dict.fromkeys(PHASES, 0)
+
+    distance, sums = flight_totals(
+        positions["timestamp"],
+        np.radians(positions["latitude"]),
+        np.radians(positions["longitude"]),
+        positions["vertical_rate"],
+        positions["altitude"],
+        positions["ground_speed"],
+        vr_thr,
+        low_alt,
+    )
+    durations = {ph: int(total) for ph, total in zip(PHASES, sums)}
 
     if (
         durations["takeoff"] == 0
         and durations["climb"] > 0
-        and points[0].get("altitude", 0) < low_alt
+        and positions["altitude"][0] < low_alt
     ):
         takeoff_duration = 180
         if durations["climb"] > takeoff_duration:
@@ -57,35 +193,60 @@ def detect_phases(points, vr_thr=3, low_alt=500):
             durations["takeoff"] = durations["climb"]
             durations["climb"] = 0
 
-    return durations
-
-
-def calculate_distance(coords):
-    if len(coords) < 2:
-        return 0
-    return round(
-        sum(geodesic(coords[i], coords[i + 1]).km for i in range(len(coords) - 1)), 2
-    )
+    return round(distance, 2), durations
 
 
 def estimate_fuel(durations, model="default"):
-    fuel_rates = config.FUEL_PROFILES.get(
-        model, config.FUEL_PROFILES.get("default", {})
+    """Fuel burn (kg) per phase as a vector in PHASES order."""
+    fuel_rates = FUEL_RATES.get(resolve_model(model), DEFAULT_FUEL_RATES)
+    phase_seconds = np.array([durations[ph] for ph in PHASES], dtype=np.float64)
+    return np.round(phase_seconds / 3600 * fuel_rates, 2)
+
+
+def process_flight(fid, flight_data, s):
+    """Compute distance, phases, fuel and CO2 for one flight.
+
+    Runs in a worker process; returns None for flights with too few points.
+    """
+    pts = flight_data.get("positions", [])
+    if len(pts) < config.MINIMUM_DATA_POINTS:
+        return None
+
+    positions = position_array(pts)
+    dist_calculated, durs = flight_metrics(positions)
+    model_for_fuel = s.get("type") or s.get("aircraft", {}).get("model", "default")
+    fuel = estimate_fuel(durs, model_for_fuel)
+    co2_kg = fuel * CO2_PER_KG_FUEL
+    co2 = np.round(co2_kg, 2)
+    co2_per_passenger = round(
+        float(co2_kg.sum()) / SEATS.get(resolve_model(model_for_fuel), DEFAULT_SEATS), 2
     )
-    return {
-        ph: round((durations[ph] / 3600) * fuel_rates.get(ph, 0), 2) for ph in durations
-    }
-
 
-def estimate_co2_by_passenger(fuel_kg, model="default"):
-    co2_total = sum(fuel_kg.values()) * 3.16
-    seats = config.FUEL_PROFILES.get(
-        model, config.FUEL_PROFILES.get("default", {})
-    ).get("seats", 150)
-    return round(co2_total / seats, 2)
+    rec = {
+        "fr24_id": fid,
+        "flight": s.get("flight"),
+        "callsign": s.get("callsign", flight_data.get("callsign_or_flight")),
+        "aircraft_model": model_for_fuel,
+        "aircraft_reg": s.get("reg"),
+        "departure_icao": s.get("orig_icao"),
+        "arrival_icao": s.get("dest_icao"),
+        "departure_time_utc": s.get("datetime_takeoff"),
+        "arrival_time_utc": s.get("datetime_landed"),
+        "flight_duration_s": s.get("flight_time"),
+        "distance_calculated_km": dist_calculated,
+        "great_circle_distance_km": s.get("circle_distance"),
+        "phase_durations_s": durs,
+        "fuel_estimated_kg": dict(zip(PHASES, fuel.tolist())),
+        "co2_estimated_kg": dict(zip(PHASES, co2.tolist())),
+        "co2_total_kg": round(float(co2.sum()), 2),
+        "co2_per_passenger_kg": co2_per_passenger,
+    }
+    return rec
 
 
-def process_run_data(run_dir: Path, target_flight_id: Optional[str] = None):
+def process_run_data(
+    run_dir: Path, target_flight_id: Optional[str] = None, pretty: bool = False
+):
     logging.info(f"Processing run directory: {run_dir}")
 
     try:
@@ -96,10 +257,8 @@ def process_run_data(run_dir: Path, target_flight_id: Optional[str] = None):
         logging.error(f"Could not find required data files in {run_dir}.")
         return
 
-    with open(details_map_file, "r", encoding="utf-8") as f:
-        flight_details_map = json.load(f)
-    with open(summary_file, "r", encoding="utf-8") as f:
-        summaries = json.load(f)
+    flight_details_map = config.read_json(details_map_file)
+    summaries = config.read_json(summary_file)
     summary_map = {s.get("fr24_id"): s for s in summaries}
 
     processed_dir = run_dir / "processed"
@@ -112,52 +271,23 @@ def process_run_data(run_dir: Path, target_flight_id: Optional[str] = None):
         else flight_details_map
     )
 
-    pbar = tqdm(flights_to_process.items(), desc="⚙️  Processing Flights")
+    # Flights are independent, so they are computed across processes; map()
+    # keeps the output in the same order as the details map.
+    fids = list(flights_to_process)
     processed_flights = []
-
-    for fid, flight_data in pbar:
-        pbar.set_postfix_str(f"ID: {fid}")
-
-        pts = flight_data.get("positions", [])
-        if len(pts) < config.MINIMUM_DATA_POINTS:
-            continue
-
-        s = summary_map.get(fid, {})
-
-        coords = [
-            (p["latitude"], p["longitude"])
-            for p in pts
-            if p.get("latitude") is not None
-        ]
-        dist_calculated = calculate_distance(coords)
-        durs = detect_phases(pts)
-        model_for_fuel = s.get("type") or s.get("aircraft", {}).get("model", "default")
-        fuel = estimate_fuel(durs, model_for_fuel)
-        co2_by_phase = {ph: round(fuel[ph] * 3.16, 2) for ph in fuel}
-
-        rec = {
-            "fr24_id": fid,
-            "flight": s.get("flight"),
-            "callsign": s.get("callsign", flight_data.get("callsign_or_flight")),
-            "aircraft_model": model_for_fuel,
-            "aircraft_reg": s.get("reg"),
-            "departure_icao": s.get("orig_icao"),
-            "arrival_icao": s.get("dest_icao"),
-            "departure_time_utc": s.get("datetime_takeoff"),
-            "arrival_time_utc": s.get("datetime_landed"),
-            "flight_duration_s": s.get("flight_time"),
-            "distance_calculated_km": dist_calculated,
-            "great_circle_distance_km": s.get("circle_distance"),
-            "phase_durations_s": durs,
-            "fuel_estimated_kg": fuel,
-            "co2_estimated_kg": co2_by_phase,
-            "co2_total_kg": round(sum(co2_by_phase.values()), 2),
-            "co2_per_passenger_kg": estimate_co2_by_passenger(fuel, model_for_fuel),
-        }
-        processed_flights.append(rec)
-
-    with open(processed_file_path, "w", encoding="utf-8") as f:
-        json.dump(processed_flights, f, indent=2)
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(
+            process_flight,
+            fids,
+            [flights_to_process[fid] for fid in fids],
+            [summary_map.get(fid, {}) for fid in fids],
+            chunksize=32,
+        )
+        for rec in tqdm(results, total=len(fids), desc="⚙️  Processing Flights"):
+            if rec is not None:
+                processed_flights.append(rec)
+
+    config.write_json(processed_file_path, processed_flights, pretty=pretty)
 
     logging.info(
         f"✅ Processing complete. Saved {len(processed_flights)} flights to {processed_file_path}"
@@ -175,6 +305,11 @@ def main():
         help="Path to a specific run directory. Uses latest if not provided.",
     )
     parser.add_argument("-f", "--flight-id", help="Process only a single flight ID.")
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the processed JSON for reading (compact by default).",
+    )
     args = parser.parse_args()
 
     run_dir = None
@@ -198,7 +333,7 @@ def main():
         logging.error(f"Directory not found: {run_dir}")
         return
 
-    process_run_data(run_dir, args.flight_id)
+    process_run_data(run_dir, args.flight_id, args.pretty)
 
 
 if __name__ == "__main__":
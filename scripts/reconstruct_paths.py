@@ -1,4 +1,3 @@
-import json
 import logging
 import argparse
 import time
@@ -29,8 +28,7 @@ def main():
         )
         return
 
-    with open(timeline_file, "r") as f:
-        timelines = json.load(f)
+    timelines = config.read_json(timeline_file)
 
     raw_dir = run_dir / "raw_positions"
     raw_dir.mkdir(exist_ok=True)
@@ -69,15 +67,14 @@ def main():
                 continue
             try:
                 params = {"flights": ",".join(batch), "timestamp": ts}
-                r = requests.get(
-                    config.POSITIONS_URL, headers=config.HEADERS, params=params
+                r = config.SESSION.get(
+                    config.POSITIONS_URL, params=params, timeout=config.REQUEST_TIMEOUT
                 )
                 r.raise_for_status()
-                data = r.json()
 
+                # The body is already compact JSON; store it without re-encoding.
                 snapshot_file = raw_dir / f"snapshot_{ts}_batch_{i}.json"
-                with open(snapshot_file, "w") as f:
-                    json.dump(data, f)
+                snapshot_file.write_bytes(r.content)
 
                 time.sleep(2.1)
 